@@ -1,18 +1,20 @@
+import time
+rerun_start = time.perf_counter()  # before the other imports, so a cold start's first rerun counts them
+import random
+import uuid
 import streamlit as st
-import numpy as np
-import unicodedata
-from utils_compute import (
-    compute_number_of_component_words,
-    compute_guess_result
-)
-from utils_load_data import (
-    load_google_sheet,
-    load_data_english,
-    filter_raw_data_english,
-    compute_shared_character_df,
-    compute_shared_character_options,
-    filter_raw_data_vocab
-)
+from functools import partial
+from utils_cache import DatasetCache
+from utils_scheduler import ReviewStore, ScheduledDeck
+from utils_events import GuessEventWriter
+from utils_sessions import make_session_store, compact_session_state, dump_session_state, is_valid_session_id
+from utils_config import dataset_cache_ttl_seconds, debug_panel, timing_enabled, event_log_enabled, review_page_size, review_min_words, session_store_kind
+from utils_startup import record_home_screen_paint, startup_report
+from utils_timing import timed, record_timing, timing_report, render_prometheus
+
+# The home screen needs neither pandas nor numpy, so the modules that import them (utils_load_data,
+# utils_compute, utils_render, utils_memory) are imported inside the functions that use them.
+# That keeps the pandas import (about half a second) out of a cold start's first paint.
 
 
 # Set up session state
@@ -26,14 +28,18 @@ session_state_var_defaults = {
     'n_streak_previous': 0,
     'percent_correct': 0,
     'n_component_words': 0,
-    'df': None,
-    'df_english': None,
-    'random_state': np.random.randint(0, 100000),
+    'dataset': None,
+    'dataset_english': None,
+    'deck': None,
+    'deck_english': None,
+    'random_state': random.randrange(100000),
     'starting_index': 0,
     'max_priority_rating': 2,
     'max_quality_rating': 5,
     'min_known_rating': 3,
     'n_example_words_display': 5,
+    'vocab_order': 'Shuffled',
+    'learner': '',
     'vocab_types_all': [
         'combo', 'no combo', 'two word', 'suffix', 'prefix', 'abbreviation', 'single char',
         'phrase', 'phrase_save', 'part sent', 'sentence'
@@ -71,6 +77,16 @@ session_state_var_defaults = {
     'combo_word_guess': '',
     'current_english_guess': '',
     'problem_row': None,
+    'word_shown_at': None,
+    'guess_event_id': None,
+    # Grade of the last submitted guess, computed once in evaluate_guess()
+    'guess_result': None,
+    'session_id': uuid.uuid4().hex,
+    # Wall-clock start of the current game, to resume a spaced-repetition deck
+    'game_started_at': None,
+    # Whether this browser session's saved state was looked up, and what was last saved for it
+    'session_restored': False,
+    'saved_session_state': None,
 }
 
 gameplay_options = {
@@ -93,6 +109,12 @@ page_configs = {
 }
 
 
+def active_deck():
+    if st.session_state['gameplay_option'] == 'english':
+        return st.session_state['deck_english']
+    return st.session_state['deck']
+
+
 def game_start_reset_session_state_vars():
     # Reset variables to indicate the start of a new game
     st.session_state['game_started'] = True
@@ -101,39 +123,191 @@ def game_start_reset_session_state_vars():
     st.session_state['n_correct'] = 0
     st.session_state['percent_correct'] = 0
     st.session_state['n_streak'] = 0
-    if st.session_state['gameplay_option'] == 'english':
-        st.session_state['problem_row'] = st.session_state['df_english'].loc[st.session_state['current_index']]
-    else:
-        st.session_state['problem_row'] = st.session_state['df'].loc[st.session_state['current_index']]
+    st.session_state['game_started_at'] = time.time()
+    active_deck().jump(st.session_state['current_index'])
+    if not active_deck().is_finished():
+        st.session_state['problem_row'] = active_deck().current()
+        st.session_state['word_shown_at'] = time.perf_counter()
     st.session_state['page_icon'] = 'panda_face'
 
 
-def load_data():
-    if st.session_state['df'] is None:
-        st.session_state['df_raw'] = load_google_sheet()
-        st.session_state['df_shared_char'] = compute_shared_character_df(st.session_state['df_raw'])
-        st.session_state['df_shared_char_options'] = compute_shared_character_options(st.session_state['df_shared_char'])
-        st.session_state['df'] = filter_raw_data_vocab(st.session_state['df_raw'])
+def load_vocab_dataset(prefer_snapshot=False):
+    from utils_load_data import load_vocab_dataset
+    return load_vocab_dataset(prefer_snapshot=prefer_snapshot)
+
+
+def load_english_dataset(prefer_snapshot=False):
+    from utils_load_data import load_english_dataset
+    return load_english_dataset(prefer_snapshot=prefer_snapshot)
+
+
+def refresh_vocab_dataset(dataset):
+    from utils_load_data import refresh_vocab_dataset
+    return refresh_vocab_dataset(dataset)
+
+
+def refresh_english_dataset(dataset):
+    from utils_load_data import refresh_english_dataset
+    return refresh_english_dataset(dataset)
+
+
+# One cache per server process, shared by every browser session
+@st.cache_resource(show_spinner=False)
+def get_vocab_cache():
+    return DatasetCache(load_vocab_dataset, ttl_seconds=dataset_cache_ttl_seconds,
+                        cold_loader=partial(load_vocab_dataset, prefer_snapshot=True), refresher=refresh_vocab_dataset)
+
+
+@st.cache_resource(show_spinner=False)
+def get_english_cache():
+    return DatasetCache(load_english_dataset, ttl_seconds=dataset_cache_ttl_seconds,
+                        cold_loader=partial(load_english_dataset, prefer_snapshot=True), refresher=refresh_english_dataset)
+
+
+@st.cache_resource(show_spinner=False)
+def get_event_writer():
+    return GuessEventWriter()
+
+
+def log_guess_event(guess_result):
+    # Only queues the event; the writer thread does the disk I/O
+    if not event_log_enabled:
+        return
+    latency_seconds = None
+    if st.session_state['word_shown_at'] is not None:
+        latency_seconds = time.perf_counter() - st.session_state['word_shown_at']
+    word_id = st.session_state['problem_row'].get('id')
+    st.session_state['guess_event_id'] = get_event_writer().log_guess(
+        session_id=st.session_state['session_id'],
+        gameplay_option=st.session_state['gameplay_option'],
+        word_id=None if word_id is None else int(word_id),
+        word=st.session_state['problem_row']['chinese'],
+        guess=st.session_state['current_english_guess'] or st.session_state['combo_word_guess'],
+        correct=guess_result,
+        latency_seconds=latency_seconds,
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def get_review_store():
+    return ReviewStore()
+
+
+def learner_name():
+    # Without a name, the review history belongs to this browser session (its id is kept in the URL),
+    # rather than being shared by every anonymous player on the server
+    return st.session_state['learner'] or f"session:{st.session_state['session_id']}"
+
+
+def uses_scheduler():
+    return st.session_state['gameplay_option'] == 'vocab' and st.session_state['vocab_order'] == 'Spaced repetition'
+
+
+def prefetch_datasets():
+    get_vocab_cache().prefetch()
+    get_english_cache().prefetch()
+
+
+def build_decks():
+    from utils_load_data import build_vocab_deck, build_english_deck
+    # Sessions only hold references to the process-wide dataset, plus their own small deck.
+    # Both sheets download in parallel; the English one is only waited for in its own mode.
+    prefetch_datasets()
+    st.session_state['dataset'] = get_vocab_cache().get()
+    st.session_state['deck'] = build_vocab_deck(st.session_state['dataset'])
+    if uses_scheduler():
+        st.session_state['deck'] = ScheduledDeck(st.session_state['deck'], get_review_store(), learner_name())
 
     if st.session_state['gameplay_option'] == 'english':
-        if st.session_state['df_english'] is None:
-            st.session_state['df_english_raw'] = load_data_english()
-        st.session_state['df_english'] = filter_raw_data_english(st.session_state['df_english_raw'])
+        st.session_state['dataset_english'] = get_english_cache().get()
+        st.session_state['deck_english'] = build_english_deck(st.session_state['dataset_english'])
+
+
+@timed
+def load_data():
+    build_decks()
     game_start_reset_session_state_vars()
 
 
+# Session state outside the server process (COMBO_GAME_SESSION_STORE), so a reload, a restarted server or
+# another worker process can pick a game up where it was left
+@st.cache_resource(show_spinner=False)
+def get_session_store():
+    return make_session_store(session_store_kind)
+
+
+def get_session_id():
+    # The id lives in the URL (?session=...), which is all that follows the browser from one process to another
+    session_id = st.query_params.get('session', '')
+    if not is_valid_session_id(session_id):
+        session_id = uuid.uuid4().hex
+        st.query_params['session'] = session_id
+    return session_id
+
+
+@timed
+def resume_game():
+    # Same settings give the same deck (from the deck cache when this process has built it before),
+    # so only the position in it has to be restored
+    build_decks()
+    if uses_scheduler():
+        st.session_state['deck'].resume(st.session_state['current_index'], st.session_state['game_started_at'] or 0.0)
+        # The answer is already in the review store, and the scheduler has no "current word after answering"
+        # to go back to, so the game resumes at the next word
+        st.session_state['submitted_guess'] = False
+    else:
+        active_deck().jump(st.session_state['current_index'])
+    if not active_deck().is_finished():
+        st.session_state['problem_row'] = active_deck().current()
+    st.session_state['word_shown_at'] = time.perf_counter()
+
+
+def restore_session():
+    # Once per browser session and process: load the saved settings and game, if any
+    st.session_state['session_restored'] = True
+    if get_session_store() is None:
+        return
+    st.session_state['session_id'] = get_session_id()
+    state = get_session_store().load(st.session_state['session_id'])
+    if state is None:
+        return
+    st.session_state.update(state)
+    st.session_state['saved_session_state'] = dump_session_state(state)
+    page_configs['page_icon'] = gameplay_options[st.session_state['gameplay_option']][2]
+    if st.session_state['game_started']:
+        resume_game()
+
+
+def save_session():
+    # Only written when something in the compact state changed, e.g. not while typing a guess
+    if get_session_store() is None:
+        return
+    state_json = dump_session_state(compact_session_state(st.session_state))
+    if state_json != st.session_state['saved_session_state']:
+        get_session_store().save(st.session_state['session_id'], state_json)
+        st.session_state['saved_session_state'] = state_json
+
+
+@timed
 def restart_game():
-    st.session_state['random_state'] = np.random.randint(0, 100000)
+    st.session_state['random_state'] = random.randrange(100000)
     st.session_state['game_started'] = False
     st.session_state['submitted_guess'] = False
     st.session_state['page_icon'] = 'chicken'
 
 
+@timed
 def evaluate_guess():
     if not st.session_state['submitted_guess']:
         st.session_state['submitted_guess'] = True
         st.session_state['n_guess'] += 1
-        if compute_guess_result():
+        from utils_compute import compute_guess_result
+        guess_result = compute_guess_result()
+        st.session_state['guess_result'] = guess_result
+        if uses_scheduler():
+            active_deck().record_outcome(guess_result)
+        log_guess_event(guess_result)
+        if guess_result:
             st.session_state['n_correct'] += 1
             st.session_state['n_streak'] += 1
         else:
@@ -143,22 +317,27 @@ def evaluate_guess():
         st.session_state['percent_correct'] = 100 * st.session_state['n_correct'] / st.session_state['n_guess']
 
 
+@timed
 def fix_wrongly_incorrect():
     if st.session_state['n_streak'] == 0:
         st.session_state['n_correct'] += 1
         st.session_state['percent_correct'] = 100 * st.session_state['n_correct'] / st.session_state['n_guess']
         st.session_state['n_streak'] = st.session_state['n_streak_previous'] + 1
+        st.session_state['guess_result'] = True
+        if uses_scheduler():
+            active_deck().record_outcome(True)
+        if event_log_enabled and st.session_state['guess_event_id'] is not None:
+            get_event_writer().log_correction(st.session_state['guess_event_id'])
 
 
+@timed
 def go_to_next_word():
     if st.session_state['submitted_guess']:
-        st.session_state['current_index'] += 1
-        if st.session_state['gameplay_option'] == 'english':
-            if st.session_state['current_index'] < len(st.session_state['df_english']):
-                st.session_state['problem_row'] = st.session_state['df_english'].loc[st.session_state['current_index']]
-        else:
-            if st.session_state['current_index'] < len(st.session_state['df']):
-                st.session_state['problem_row'] = st.session_state['df'].loc[st.session_state['current_index']]
+        active_deck().advance()
+        st.session_state['current_index'] = active_deck().position
+        if not active_deck().is_finished():
+            st.session_state['problem_row'] = active_deck().current()
+        st.session_state['word_shown_at'] = time.perf_counter()
         st.session_state['current_english_guess'] = ''
         st.session_state['combo_word_guess'] = ''
         st.session_state['submitted_guess'] = False
@@ -168,6 +347,9 @@ def go_to_next_word():
 def fn_button_clicked(button_name=''):
     st.session_state[f'button_clicked_{button_name}'] = True
 
+if not st.session_state['session_restored']:
+    restore_session()
+
 if st.session_state['button_clicked_start_game']:
     st.session_state['button_clicked_start_game'] = False
     load_data()
@@ -195,9 +377,11 @@ if st.session_state['button_clicked_wrongly_incorrect']:
 
 
 # Displays
+@timed
 def display_header():
     st.title("Chinese Combo-Word Game")
 
+@timed
 def display_not_in_game():
     st.write("Study vocabulary building upon simpler words!")
     st.write("-- Example #1: 黄油 (butter) = 黄 (yellow) + 油 (oil)")
@@ -218,27 +402,39 @@ def display_not_in_game():
     st.session_state['prompt_show_chinese'] = col1a_vocopt.selectbox(
         label='Prompt Chinese characters',
         options=['Yes', 'No'],
-        index=0 if st.session_state['prompt_show_chinese'] is 'Yes' else 1,
+        index=0 if st.session_state['prompt_show_chinese'] == 'Yes' else 1,
     )
     st.session_state['prompt_show_pinyin'] = col1b_vocopt.selectbox(
         label='Prompt pinyin too',
         options=['Yes', 'No'],
-        index=0 if st.session_state['prompt_show_pinyin'] is 'Yes' else 1,
+        index=0 if st.session_state['prompt_show_pinyin'] == 'Yes' else 1,
     )
 
     col2a_vocopt, col2b_vocopt, col2c_vocopt = st.columns([0.33, 0.33, 0.34])
     st.session_state['prompt_show_chinese_combo'] = col2a_vocopt.selectbox(
         label='Prompt component word Chinese',
         options=['Yes', 'No'],
-        index=0 if st.session_state['prompt_show_chinese_combo'] is 'Yes' else 1,
+        index=0 if st.session_state['prompt_show_chinese_combo'] == 'Yes' else 1,
     )
     st.session_state['prompt_show_english_combo'] = col2b_vocopt.selectbox(
         label='Prompt component English too',
         options=['Yes', 'No'],
-        index=0 if st.session_state['prompt_show_english_combo'] is 'Yes' else 1,
+        index=0 if st.session_state['prompt_show_english_combo'] == 'Yes' else 1,
     )
     st.session_state['n_example_words_display'] = col2c_vocopt.number_input('\# shared character words displayed', min_value=0, max_value=20, value=st.session_state['n_example_words_display'])
 
+    col4a_vocopt, col4b_vocopt = st.columns([0.5, 0.5])
+    st.session_state['vocab_order'] = col4a_vocopt.selectbox(
+        label='Word order',
+        options=['Shuffled', 'Spaced repetition'],
+        index=0 if st.session_state['vocab_order'] == 'Shuffled' else 1,
+    )
+    st.session_state['learner'] = col4b_vocopt.text_input(
+        label='Learner name (spaced repetition history)',
+        value=st.session_state['learner'],
+        help='Without a name, the history is kept for this browser session only',
+    )
+
     col1_advopt, col2_advopt, col3_advopt = st.columns([0.33, 0.33, 0.34])
     st.session_state['max_priority_rating'] = col1_advopt.selectbox('Max. priority rating', options=[1, 2, 3, 4, 5], index=st.session_state['max_priority_rating'] - 1)
     st.session_state['min_known_rating'] = col2_advopt.selectbox('Min. known rating', options=[1, 2, 3, 4, 5], index=st.session_state['min_known_rating'] - 1)
@@ -277,6 +473,7 @@ def display_not_in_game():
     st.write('If you have any questions or suggestions, or if you are willing to contribute to creating or improving vocabulary, please feel free to contact me at scott.cole0@gmail.com')
 	
 
+@timed
 def display_feedback():
     if st.session_state['n_streak'] > 0:
         correctness_feedback = 'CORRECT! :cow2:'
@@ -285,6 +482,7 @@ def display_feedback():
     st.write(f"{correctness_feedback}")
 
 
+@timed
 def display_game_over():
     st.write("No words remaining")
     if st.session_state['gameplay_option'] != 'review_mode':
@@ -293,67 +491,41 @@ def display_game_over():
     st.button(label = 'Back to home', on_click=fn_button_clicked, kwargs={'button_name': 'restart_game'})
 
 
+@timed
 def display_full_vocab():
-    st.session_state['n_component_words'] = compute_number_of_component_words()
-    st.write(f"[{st.session_state['problem_row']['chinese']}](https://www.dong-chinese.com/dictionary/search/{st.session_state['problem_row']['chinese']}) ({st.session_state['problem_row']['pinyin']}) - {st.session_state['problem_row']['english']}")
-    if st.session_state['n_component_words'] > 0:
-        cols_prompt_words = st.columns(st.session_state['n_component_words'])
-        for component_word_idx in range(st.session_state['n_component_words']):
-            component_prompt_str = f"Component word {component_word_idx+1}: [{st.session_state['problem_row'][f'word{component_word_idx+1}']}](https://www.dong-chinese.com/dictionary/search/{st.session_state['problem_row'][f'word{component_word_idx+1}']}) ({st.session_state['problem_row'][f'word{component_word_idx+1}_english']})"
+    from utils_render import get_full_vocab_panels
+    # Usually already built in the background by prefetch_feedback_panels(), so this only renders
+    panels = get_full_vocab_panels(st.session_state['dataset'], st.session_state['problem_row'], st.session_state['n_example_words_display'])
+    st.session_state['n_component_words'] = panels['n_component_words']
+    st.write(panels['header'])
+    if panels['used_in']:
+        st.write(panels['used_in'])
+    if panels['components']:
+        cols_prompt_words = st.columns(len(panels['components']))
+        for component_word_idx, component_prompt_str in enumerate(panels['components']):
             cols_prompt_words[component_word_idx].write(component_prompt_str)
+    if panels['examples']:
+        cols_example_words = st.columns(len(panels['examples']))
+        for component_word_idx, component_prompt_str in enumerate(panels['examples']):
+            cols_example_words[component_word_idx].write(component_prompt_str)
 
-        if st.session_state['n_example_words_display'] > 0:
-            cols_example_words = st.columns(st.session_state['n_component_words'])
-            for component_word_idx in range(st.session_state['n_component_words']):
-                # get first character of overlap between component word and combo word
-                shared_char = st.session_state['problem_row'][f'word{component_word_idx+1}']
-                if len(shared_char) > 1:
-                    not_found_shared_char, combo_word_idx, component_word_char_idx = True, 0, 0
-                    while not_found_shared_char:
-                        if st.session_state['problem_row']['chinese'][combo_word_idx] == shared_char[component_word_char_idx]:
-                            shared_char = shared_char[component_word_char_idx]
-                            not_found_shared_char = False
-                        else:
-                            combo_word_idx += 1
-                            if combo_word_idx >= len(st.session_state['problem_row']['chinese']):
-                                combo_word_idx = 0
-                                component_word_char_idx += 1
-
-                df_this_char_other_words = st.session_state['df_shared_char'][st.session_state['df_shared_char']['shared_char'] == shared_char].reset_index(drop=True)
-                df_this_char_other_words = df_this_char_other_words[~df_this_char_other_words['chinese'].isin([shared_char, st.session_state['problem_row'][f'word{component_word_idx+1}'], st.session_state['problem_row']['chinese']])].reset_index(drop=True)
-                df_this_char_other_words = df_this_char_other_words[df_this_char_other_words['pinyin'] != ''].reset_index(drop=True)
-                component_prompt_str = f"{df_this_char_other_words.shape[0]} other words with '{shared_char}':"
-                for i_row, row in df_this_char_other_words.iterrows():
-                    if i_row >= st.session_state['n_example_words_display']:
-                        break
-                    component_prompt_str += f"\n\n{row['chinese']} ({row['pinyin']}) - {row['english']}"
-                cols_example_words[component_word_idx].write(component_prompt_str)
 
-    else:
-        if st.session_state['n_example_words_display'] > 0:
-            st.session_state['n_characters'] = len(st.session_state['problem_row']['chinese'])
-            cols_example_words = st.columns(st.session_state['n_characters'])
-            for component_word_idx in range(st.session_state['n_characters']):
-                shared_char = st.session_state['problem_row']['chinese'][component_word_idx]
-
-                df_this_char_other_words = st.session_state['df_shared_char'][st.session_state['df_shared_char']['shared_char'] == shared_char].reset_index(drop=True)
-                df_this_char_other_words = df_this_char_other_words[df_this_char_other_words['pinyin'] != ''].reset_index(drop=True)
-                component_prompt_str = f"{df_this_char_other_words.shape[0]} other words with '{shared_char}':"
-                for i_row, row in df_this_char_other_words.iterrows():
-                    if i_row >= st.session_state['n_example_words_display']:
-                        break
-                    component_prompt_str += f"\n\n{row['chinese']} ({row['pinyin']}) - {row['english']}"
-                cols_example_words[component_word_idx].write(component_prompt_str)
+def prefetch_feedback_panels():
+    # Start building the feedback panels of the current and next few words while this screen is up
+    from utils_render import prefetch_full_vocab_panels
+    prefetch_full_vocab_panels(st.session_state['dataset'], active_deck(), st.session_state['n_example_words_display'])
 
 
+@timed
 def display_review_mode():
-    st.write(f"Vocabulary # {st.session_state['current_index'] + 1} / {len(st.session_state['df'])}")
+    st.write(f"Vocabulary # {st.session_state['current_index'] + 1} / {len(st.session_state['deck'])}")
     display_full_vocab()
     st.button(label = 'Next word', on_click=fn_button_clicked, kwargs={'button_name': 'next_word'})
     st.button(label = 'Back to home', on_click=fn_button_clicked, kwargs={'button_name': 'restart_game'})
     st.session_state['submitted_guess'] = True
 
 
+@timed
 def display_review_shared():
     # How to select character?
     st.session_state['shared_char_select_type'] = st.radio("How to select character?",
@@ -366,36 +538,59 @@ def display_review_shared():
         options=['Words only', 'Include phrases'],
         index=0,
     )
-    if st.session_state['shared_char_select_phrase_inclusion'] == 'Words only':
-        st.session_state['df_shared_char_use'] = st.session_state['df_shared_char'][st.session_state['df_shared_char']['type'].isin(['phrase', 'phrase_save']) == False].reset_index(drop=True)
-    else:
-        st.session_state['df_shared_char_use'] = st.session_state['df_shared_char'].copy()
+    words_only = st.session_state['shared_char_select_phrase_inclusion'] == 'Words only'
 
     # Select the character
     if st.session_state['shared_char_select_type'] == 'Select character from list':
-        selection_options = st.session_state['df_shared_char_options'][st.session_state['df_shared_char_options']['n_words'] >= 10]
         st.session_state['shared_char_selected'] = st.selectbox(
             label='Select character',
-            options=selection_options,
+            options=st.session_state['dataset']['review_char_options'],
             index=0
         )
+        if not st.session_state['dataset']['review_char_options']:
+            # Nothing to list, e.g. on a small sheet
+            st.write(f'No character is in {review_min_words} or more words; enter a character instead')
+            st.button(label = 'Back to home', on_click=fn_button_clicked, kwargs={'button_name': 'restart_game'})
+            st.session_state['submitted_guess'] = True
+            return
     else:
         st.session_state['shared_char_selected'] = st.text_input(
-            label='Enter character',
+            label='Enter character (or search by several characters, pinyin or English)',
             value='牛'
         )
 
-    # Compute words with that character and display them
-    st.session_state['shared_char_selected_words'] = st.session_state['df_shared_char_use'][st.session_state['df_shared_char_use']['shared_char'] == st.session_state['shared_char_selected']]
-    st.write(f'{len(st.session_state['shared_char_selected_words'])} words contain {st.session_state['shared_char_selected']}')
-    for _, row in st.session_state['shared_char_selected_words'].iterrows():
-        st.write(f"{row['chinese']}: {row['english']}")
+    # Display the words with that character, one page at a time in a single table
+    from utils_render import review_page, review_search_page
+    shared_char = (st.session_state['shared_char_selected'] or '').strip()
+    is_search = len(shared_char) != 1 or shared_char.isascii()
+    if is_search:
+        # Ranked matches from the search index; the count comes with the first page
+        n_words, page_words = review_search_page(st.session_state['dataset'], shared_char, words_only, 1, review_page_size)
+        st.write(f'{n_words} words match {shared_char}')
+    else:
+        df_shared_char_counts = st.session_state['dataset']['df_shared_char_counts']
+        n_words = df_shared_char_counts['n_words_only' if words_only else 'n_words'].get(shared_char, 0)
+        rank_str = f" (#{df_shared_char_counts.at[shared_char, 'rank']} of {len(df_shared_char_counts)} characters)" if shared_char in df_shared_char_counts.index else ''
+        st.write(f'{n_words} words contain {shared_char}{rank_str}')
+    n_pages = max(1, -(-n_words // review_page_size))
+    page = 1
+    if n_pages > 1:
+        # Keyed by query, so picking another character starts again at page 1
+        page = st.number_input(f'Page (of {n_pages})', min_value=1, max_value=n_pages, value=1, key=f'review_page_{shared_char}_{words_only}')
+    if is_search:
+        if page > 1:
+            _, page_words = review_search_page(st.session_state['dataset'], shared_char, words_only, page, review_page_size)
+    else:
+        page_words = review_page(st.session_state['dataset'], shared_char, words_only, page, review_page_size)
+    if n_words > 0:
+        st.dataframe(page_words, hide_index=True, use_container_width=True)
 
     # Return to home and housekeeping
     st.button(label = 'Back to home', on_click=fn_button_clicked, kwargs={'button_name': 'restart_game'})
     st.session_state['submitted_guess'] = True
 
 
+@timed
 def display_vocab_prompt():
     # Prompt for the guess
     if st.session_state['prompt_show_chinese'] == 'Yes':
@@ -408,6 +603,7 @@ def display_vocab_prompt():
         st.text_input(label=f"'{st.session_state['problem_row'][f'english']}' in Chinese:", max_chars=20, value='', key='combo_word_guess', autocomplete='off')
 
     # Compute the components
+    from utils_compute import compute_number_of_component_words
     st.session_state['n_component_words'] = compute_number_of_component_words()
     if st.session_state['n_component_words'] > 0:
         all_components_english = []
@@ -433,6 +629,7 @@ def display_vocab_prompt():
     col2_submit.button(label = 'Skip', on_click=fn_button_clicked, kwargs={'button_name': 'skip'})
 
 
+@timed
 def display_feedback_and_continue():
     display_feedback()
     display_full_vocab()
@@ -441,6 +638,7 @@ def display_feedback_and_continue():
     col2_feedback.button(label = "Wrongly marked as 'incorrect'", on_click=fn_button_clicked, kwargs={'button_name': 'wrongly_incorrect'})
 
 
+@timed
 def display_score_and_restart():
     st.header("Score")
     col1_score, col2_score, col3_score = st.columns([0.6, 0.2, 0.2])
@@ -448,27 +646,14 @@ def display_score_and_restart():
     col2_score.write(f"Streak: {st.session_state['n_streak']}")
     col3_score.button(label = 'Restart game', on_click=fn_button_clicked, kwargs={'button_name': 'restart_game'})
 
-def tmp_convert_str_to_number(whole_string):
-    current_sum = 0
-    for i_letter, letter in enumerate(whole_string):
-        current_sum += (ord(letter.lower()) - ord('a') + 10) * (i_letter + 1)
-    return current_sum
-
+@timed
 def display_full_vocab_english():
     st.write(f"{st.session_state['problem_row']['english']} ({st.session_state['problem_row']['IPA pronounce']}) - {st.session_state['problem_row']['chinese']}")
     st.write(f"{st.session_state['problem_row']['例句']}")
+    guess = st.session_state['current_english_guess'] if st.session_state['prompt_type_english'] == '中文' else st.session_state['combo_word_guess']
+    st.write(f"Your answer: {guess}, Result: {st.session_state['guess_result']}")
 
-    if st.session_state['prompt_type_english'] == '中文':
-        st.write(f"Original : {st.session_state['current_english_guess']}, Result: {compute_guess_result()}")
-        st.write(f"String   : str({str(st.session_state['current_english_guess'])}), Result: {(str(st.session_state['current_english_guess']) == str(st.session_state['problem_row']['english']))}")
-        st.write(f"Integer  : {tmp_convert_str_to_number(st.session_state['current_english_guess'])}, {tmp_convert_str_to_number(st.session_state['problem_row']['english'])}, Result: {(tmp_convert_str_to_number(st.session_state['current_english_guess']) == tmp_convert_str_to_number(st.session_state['problem_row']['english']))}")
-        st.write(f"Unicode  : {unicodedata.normalize("NFD", st.session_state['current_english_guess'])}, {unicodedata.normalize("NFD", st.session_state['problem_row']['english'])}, Result: {(unicodedata.normalize("NFD", st.session_state['current_english_guess']) == unicodedata.normalize("NFD", st.session_state['problem_row']['english']))}")
-    else:
-        st.write(f"Original : {st.session_state['combo_word_guess']}, Result: {compute_guess_result()}")
-        st.write(f"String   : str({str(st.session_state['combo_word_guess'])}), Result: {(str(st.session_state['combo_word_guess']) == str(st.session_state['problem_row']['chinese']))}")
-        st.write(f"Integer  : {tmp_convert_str_to_number(st.session_state['combo_word_guess'])}, {tmp_convert_str_to_number(st.session_state['problem_row']['chinese'])}, Result: {(tmp_convert_str_to_number(st.session_state['combo_word_guess']) == tmp_convert_str_to_number(st.session_state['problem_row']['chinese']))}")
-        st.write(f"Unicode  : {unicodedata.normalize("NFD", st.session_state['combo_word_guess'])}, {unicodedata.normalize("NFD", st.session_state['problem_row']['chinese'])}, Result: {(unicodedata.normalize("NFD", st.session_state['combo_word_guess']) == unicodedata.normalize("NFD", st.session_state['problem_row']['chinese']))}")
-
+@timed
 def display_vocab_prompt_english():
     # Prompt for the guess
     if st.session_state['prompt_type_english'] == '中文':
@@ -482,6 +667,7 @@ def display_vocab_prompt_english():
     col2_submit.button(label = 'Skip', on_click=fn_button_clicked, kwargs={'button_name': 'skip'})
 
 
+@timed
 def display_feedback_and_continue_english():
     display_feedback()
     display_full_vocab_english()
@@ -490,26 +676,54 @@ def display_feedback_and_continue_english():
     col2_feedback.button(label = "Wrongly marked as 'incorrect'", on_click=fn_button_clicked, kwargs={'button_name': 'wrongly_incorrect'})
 
 
+def display_debug_sidebar():
+    # Only shown with COMBO_GAME_DEBUG=1
+    from utils_load_data import get_deck_cache
+    from utils_memory import session_memory_report, process_memory_report
+    from utils_render import get_panel_cache, panel_prefetch_stats
+    datasets = {'dataset': get_vocab_cache().value, 'dataset_english': get_english_cache().value}
+    shared_objects = [dataset for dataset in datasets.values() if dataset is not None] + get_deck_cache().values()
+    st.sidebar.header('Debug')
+    st.sidebar.write('Dataset caches')
+    st.sidebar.json({'vocab': get_vocab_cache().stats(), 'english': get_english_cache().stats(), 'decks': get_deck_cache().stats(), 'panels': get_panel_cache().stats(), 'panel_prefetch': panel_prefetch_stats(), 'guess_events': get_event_writer().stats() if event_log_enabled else None, 'sessions': get_session_store().stats() if get_session_store() is not None else None}, expanded=False)
+    st.sidebar.write('Memory')
+    st.sidebar.json({
+        'process': process_memory_report(datasets, caches=[('deck_cache', get_deck_cache()), ('panel_cache', get_panel_cache())]),
+        'session': session_memory_report(st.session_state, shared_objects),
+    }, expanded=False)
+    st.sidebar.write('Startup')
+    st.sidebar.json(startup_report(), expanded=False)
+    if timing_enabled:
+        st.sidebar.write('Timings (this process)')
+        st.sidebar.dataframe([{'function': name, **stats} for name, stats in timing_report().items()], hide_index=True)
+        st.sidebar.download_button('Download Prometheus metrics', render_prometheus(), file_name='combo_game_timings.prom')
+
+
 # Set up the page depending on gameplay state
 st.set_page_config(**page_configs)
 display_header()
 if not st.session_state['game_started']:
     display_not_in_game()
-elif st.session_state['current_index'] >= len(st.session_state['df']):
+    record_home_screen_paint(rerun_start)
+    # Download both sheets while the user picks a mode and settings
+    prefetch_datasets()
+elif active_deck().is_finished():
     display_game_over()
 elif st.session_state['gameplay_option'] == 'review_mode':
     display_review_mode()
+    prefetch_feedback_panels()
 elif st.session_state['gameplay_option'] == 'review_shared':
     display_review_shared()
 elif st.session_state['gameplay_option'] == 'vocab':
-    st.write(f"Vocabulary # {st.session_state['current_index'] + 1} / {len(st.session_state['df'])}")
+    st.write(f"Vocabulary # {st.session_state['current_index'] + 1} / {len(st.session_state['deck'])}")
     if st.session_state['submitted_guess']:
         display_feedback_and_continue()
     else:
         display_vocab_prompt()
     display_score_and_restart()
+    prefetch_feedback_panels()
 elif st.session_state['gameplay_option'] == 'english':
-    st.write(f"Vocabulary # {st.session_state['current_index'] + 1} / {len(st.session_state['df_english'])}")
+    st.write(f"Vocabulary # {st.session_state['current_index'] + 1} / {len(st.session_state['deck_english'])}")
     if st.session_state['submitted_guess']:
         display_feedback_and_continue_english()
     else:
@@ -517,3 +731,11 @@ elif st.session_state['gameplay_option'] == 'english':
     display_score_and_restart()
 else:
     st.write(f"Gameplay option {st.session_state['gameplay_option']} not valid")
+
+save_session()
+
+if debug_panel:
+    display_debug_sidebar()
+
+if timing_enabled:
+    record_timing('app_rerun', time.perf_counter() - rerun_start)
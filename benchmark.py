@@ -0,0 +1,206 @@
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from utils_compute import evaluate_english_guess, evaluate_chinese_guess_with_key, compile_chinese_answer_key
+from utils_index import PinyinAnswerIndex, SharedCharIndex, WordGraph, WordSearchIndex
+from utils_load_data import (
+    load_google_sheet,
+    compute_shared_character_df,
+    compute_shared_character_options,
+    filter_raw_data_vocab,
+    add_derived_vocab_cols,
+    build_vocab_dataset,
+    update_vocab_dataset,
+)
+from utils_render import build_full_vocab_panels
+from utils_snapshot import compute_row_hashes
+from utils_synthetic import write_fixture_sheets
+
+# Benchmarks for the hot paths, on synthetic sheets so they run offline.
+#   python benchmark.py --sizes 1000 10000 100000 1000000 --output bench.json
+#   python benchmark.py --output new.json --compare bench.json
+
+default_settings = (
+    2, 3, 5,
+    ('combo', 'no combo', 'two word', 'suffix', 'prefix', 'abbreviation', 'single char'),
+    ('', 'food', 'general', 'career', 'characteristic', 'society', 'health', 'people', 'life', 'electronics',
+     'feeling', 'travel', 'outdoor', 'language', 'amount', 'time', 'verb', 'hobbies', 'china', 'shopping'),
+    1234, 0,
+)
+n_guesses = 1000
+n_panel_words = 1000
+n_edited_rows = 10
+n_search_queries = 1000
+n_graph_queries = 1000
+
+
+def time_repeats(fn, n_repeats):
+    durations = []
+    for _ in range(n_repeats):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def make_guesses(df_raw, rng):
+    # Mix of exact, partial and unrelated guesses against real answers
+    answers = df_raw['english'].to_numpy()[rng.integers(0, len(df_raw), size=n_guesses)]
+    unrelated = df_raw['english'].to_numpy()[rng.integers(0, len(df_raw), size=n_guesses)]
+    guesses = []
+    for i_guess, answer in enumerate(answers):
+        option = answer.split(';')[0]
+        guesses.append([option, option[:max(1, len(option) // 2)], unrelated[i_guess]][i_guess % 3])
+    return list(zip(guesses, answers))
+
+
+def build_panels(dataset, positions):
+    # What display_full_vocab() builds for a word on a panel cache miss (the default 5 example words)
+    for row_position in positions:
+        build_full_vocab_panels(dataset['records'].record(row_position), dataset['shared_char_index'], dataset['word_graph'], 5)
+
+
+def make_chinese_guesses(df_raw, rng):
+    # (guess, answer key, word id) triples: the hanzi, the pinyin with tones, or the pinyin with tone numbers
+    rows = rng.integers(0, len(df_raw), size=n_guesses)
+    chinese = df_raw['chinese'].array[rows].tolist()
+    pinyin = df_raw['pinyin'].array[rows].tolist()
+    word_ids = df_raw['id'].to_numpy()[rows].tolist()
+    guesses = [[chinese[i_guess], pinyin[i_guess], f'{pinyin[i_guess]}3'][i_guess % 3] for i_guess in range(n_guesses)]
+    return [(guess, compile_chinese_answer_key(answer), word_id) for guess, answer, word_id in zip(guesses, chinese, word_ids)]
+
+
+def make_search_queries(df_raw, rng):
+    # Review-mode searches: part of a word, a pinyin syllable, or a word of the English
+    rows = rng.integers(0, len(df_raw), size=n_search_queries)
+    queries = []
+    for i_query, (chinese, pinyin, english) in enumerate(zip(*(df_raw[col].to_numpy()[rows] for col in ['chinese', 'pinyin', 'english']))):
+        queries.append([chinese[:2], pinyin.split(' ')[0], english.split(' ')[0]][i_query % 3])
+    return queries
+
+
+def edit_sheet(df_raw, rng):
+    # The sheet after an editor changed the English of a few words
+    df_edited = df_raw.copy()
+    rows = rng.choice(len(df_edited), size=min(n_edited_rows, len(df_edited)), replace=False)
+    df_edited.iloc[rows, df_edited.columns.get_loc('english')] = [f'edited {i_row}' for i_row in range(len(rows))]
+    return df_edited
+
+
+def run_benchmarks(n_rows, n_repeats, seed=0):
+    rng = np.random.default_rng(seed)
+    with tempfile.TemporaryDirectory() as directory:
+        vocab_path, _ = write_fixture_sheets(directory, n_rows, seed)
+        timings = {'load_google_sheet': time_repeats(lambda: load_google_sheet(vocab_path), n_repeats)}
+        df_raw = load_google_sheet(vocab_path)
+
+    df_shared_char = compute_shared_character_df(df_raw)
+    index = SharedCharIndex(df_shared_char)
+    guesses_and_answers = make_guesses(df_raw, rng)
+    search_queries = make_search_queries(df_raw, rng)
+
+    timings['compute_shared_character_df'] = time_repeats(lambda: compute_shared_character_df(df_raw), n_repeats)
+    timings['compute_shared_character_options'] = time_repeats(lambda: compute_shared_character_options(df_shared_char), n_repeats)
+    timings['build_shared_char_index'] = time_repeats(lambda: SharedCharIndex(df_shared_char), n_repeats)
+    timings['filter_raw_data_vocab'] = time_repeats(lambda: filter_raw_data_vocab(df_raw, settings=default_settings), n_repeats)
+    timings[f'evaluate_english_guess_x{n_guesses}'] = time_repeats(
+        lambda: [evaluate_english_guess(guess, answer) for guess, answer in guesses_and_answers], n_repeats)
+    timings['build_search_index'] = time_repeats(lambda: WordSearchIndex(index, df_raw), n_repeats)
+    search_index = WordSearchIndex(index, df_raw)
+    timings[f'search_x{n_search_queries}'] = time_repeats(
+        lambda: [search_index.search(query, limit=50) for query in search_queries], n_repeats)
+    df_raw_derived = add_derived_vocab_cols(df_raw)
+    timings['build_word_graph'] = time_repeats(lambda: WordGraph(df_raw_derived), n_repeats)
+    word_graph = WordGraph(df_raw_derived)
+    graph_words = word_graph.words[rng.integers(0, len(word_graph.words), size=n_graph_queries)].tolist()
+    timings[f'word_graph_decompose_x{n_graph_queries}'] = time_repeats(lambda: [word_graph.decompose(word) for word in graph_words], n_repeats)
+    timings[f'word_graph_used_in_x{n_graph_queries}'] = time_repeats(lambda: [word_graph.used_in(word) for word in graph_words], n_repeats)
+    timings['word_graph_all_used_in'] = time_repeats(lambda: word_graph.all_used_in(graph_words), n_repeats)
+    timings['build_pinyin_answer_index'] = time_repeats(lambda: PinyinAnswerIndex(df_raw), n_repeats)
+    pinyin_answer_index = PinyinAnswerIndex(df_raw)
+    chinese_guesses = make_chinese_guesses(df_raw, rng)
+    timings[f'evaluate_chinese_guess_x{n_guesses}'] = time_repeats(
+        lambda: [evaluate_chinese_guess_with_key(guess, answer_key, pinyin_answer_index, word_id) for guess, answer_key, word_id in chinese_guesses],
+        n_repeats)
+    # A refresh hashes the fetched rows for its content hash anyway, so the row hashes come for free
+    dataset = build_vocab_dataset(df_raw, 'v1', 0, compute_row_hashes(df_raw))
+    panel_positions = rng.integers(0, len(dataset['df_raw']), size=n_panel_words)
+    timings[f'build_full_vocab_panels_x{n_panel_words}'] = time_repeats(lambda: build_panels(dataset, panel_positions), n_repeats)
+    df_edited = edit_sheet(df_raw, rng)
+    edited_row_hashes = compute_row_hashes(df_edited)
+    timings['build_vocab_dataset'] = time_repeats(lambda: build_vocab_dataset(df_edited, 'v2', 0), n_repeats)
+    timings[f'update_vocab_dataset_{n_edited_rows}_rows'] = time_repeats(
+        lambda: update_vocab_dataset(dataset, df_edited, 'v2', 0, edited_row_hashes), n_repeats)
+
+    return [
+        {
+            'n_rows': n_rows,
+            'name': name,
+            'n_repeats': n_repeats,
+            'min_seconds': min(durations),
+            'median_seconds': statistics.median(durations),
+            'mean_seconds': statistics.fmean(durations),
+        }
+        for name, durations in timings.items()
+    ]
+
+
+def compare_results(results, baseline, threshold):
+    # Benchmarks whose median got slower than the baseline by more than threshold (a fraction)
+    baseline_medians = {(r['n_rows'], r['name']): r['median_seconds'] for r in baseline['results']}
+    regressions = []
+    for result in results:
+        baseline_median = baseline_medians.get((result['n_rows'], result['name']))
+        if baseline_median and result['median_seconds'] > baseline_median * (1 + threshold):
+            regressions.append({**result, 'baseline_median_seconds': baseline_median})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the vocabulary game hot paths on synthetic sheets')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='sheet sizes in rows')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--compare', help='baseline JSON from an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown vs the baseline, as a fraction')
+    args = parser.parse_args()
+
+    results = []
+    for n_rows in args.sizes:
+        for result in run_benchmarks(n_rows, args.repeats, args.seed):
+            print(f"{result['n_rows']:>9,} rows  {result['name']:<36} median {result['median_seconds'] * 1000:10.2f} ms")
+            results.append(result)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare_results(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression['n_rows']:,} rows {regression['name']}: "
+                  f"{regression['baseline_median_seconds'] * 1000:.2f} ms -> {regression['median_seconds'] * 1000:.2f} ms")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Headless load test of the game flow: many simulated sessions play each gameplay mode against a
+# local synthetic sheet, and the rerun latency and peak memory are reported.
+#   python load_test.py --sessions 50 --words 10 --rows 5000 --output load_test.json
+#
+# AppTest is not thread-safe, so within one worker process the sessions take turns: every session
+# stays alive (sharing the process-wide caches like real users on one server) and each step advances
+# every session by one action. Use --processes to run several such workers in parallel.
+
+modes = ['vocab', 'review_mode', 'review_shared', 'english']
+
+
+class SimulatedSession:
+    def __init__(self, mode, n_words, rng):
+        from streamlit.testing.v1 import AppTest
+        self.app = AppTest.from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py'), default_timeout=60)
+        self.mode = mode
+        self.rng = rng
+        self.actions = self._plan_actions(n_words)
+        self.rerun_seconds = []
+        self.errors = []
+
+    def _plan_actions(self, n_words):
+        actions = [('run', None), ('select_mode', self.mode), ('click', 'Start game')]
+        for _ in range(n_words):
+            if self.mode in ('vocab', 'english'):
+                actions += [('guess', None), ('click', 'Submit'), ('click', 'Next word')]
+            elif self.mode == 'review_mode':
+                actions += [('click', 'Next word')]
+            else:
+                actions += [('toggle_phrases', None)]
+        return actions
+
+    def _timed_run(self, widget_or_app):
+        start = time.perf_counter()
+        widget_or_app.run()
+        self.rerun_seconds.append(time.perf_counter() - start)
+        if self.app.exception:
+            self.errors.append(self.app.exception[0].message)
+
+    def _guess(self):
+        # Half the guesses are right, as the fn_button_clicked submit flow will see them
+        problem_row = self.app.session_state['problem_row']
+        right_answer = problem_row['english'] if self.app.text_input[0].key == 'current_english_guess' else problem_row['chinese']
+        return right_answer if self.rng.random() < 0.5 else 'wrong'
+
+    def step(self):
+        # Perform the next action; returns False when the session is done
+        if not self.actions:
+            return False
+        action, argument = self.actions.pop(0)
+        if action == 'run':
+            self._timed_run(self.app)
+        elif action == 'select_mode':
+            self._timed_run(self.app.radio[0].set_value(argument))
+        elif action == 'click':
+            buttons = [button for button in self.app.button if button.label == argument]
+            if not buttons:
+                # e.g. the deck ran out of words
+                self.actions = []
+                return False
+            self._timed_run(buttons[0].click())
+        elif action == 'guess':
+            if self.app.text_input:
+                self.app.text_input[0].set_value(self._guess())
+        elif action == 'toggle_phrases':
+            radio = self.app.radio[1]
+            self._timed_run(radio.set_value(self.rng.choice(radio.options)))
+        return True
+
+
+def _quantile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+def run_worker(n_sessions, n_words, seed):
+    # One worker process: create every session, then advance them in turns until all are done
+    from utils_memory import peak_rss_bytes
+    rng = random.Random(seed)
+    sessions = [SimulatedSession(modes[i_session % len(modes)], n_words, rng) for i_session in range(n_sessions)]
+    start = time.perf_counter()
+    active = list(sessions)
+    while active:
+        active = [session for session in active if session.step()]
+    return {
+        'elapsed_seconds': time.perf_counter() - start,
+        'rerun_seconds_by_mode': {
+            mode: [seconds for session in sessions if session.mode == mode for seconds in session.rerun_seconds]
+            for mode in modes
+        },
+        'errors': [error for session in sessions for error in session.errors],
+        'peak_rss_bytes': peak_rss_bytes(),
+    }
+
+
+def summarize(rerun_seconds):
+    return {
+        'n_reruns': len(rerun_seconds),
+        'p50_seconds': _quantile(rerun_seconds, 0.5),
+        'p99_seconds': _quantile(rerun_seconds, 0.99),
+        'mean_seconds': statistics.fmean(rerun_seconds) if rerun_seconds else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless multi-session load test of the game flow')
+    parser.add_argument('--sessions', type=int, default=20, help='simulated sessions per worker process')
+    parser.add_argument('--processes', type=int, default=1, help='worker processes (each is like one server replica)')
+    parser.add_argument('--words', type=int, default=10, help='words played per session')
+    parser.add_argument('--rows', type=int, default=5000, help='rows in the synthetic vocab sheet')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Point the app at local fixture sheets before anything imports utils_config
+        from utils_synthetic import write_fixture_sheets
+        vocab_path, english_path = write_fixture_sheets(directory, args.rows, args.seed)
+        os.environ['COMBO_GAME_VOCAB_SHEET'] = vocab_path
+        os.environ['COMBO_GAME_ENGLISH_SHEET'] = english_path
+        os.environ['COMBO_GAME_DATA_DIR'] = os.path.join(directory, 'data')
+
+        with ProcessPoolExecutor(args.processes) as executor:
+            workers = list(executor.map(
+                run_worker,
+                [args.sessions] * args.processes,
+                [args.words] * args.processes,
+                [args.seed + i_worker for i_worker in range(args.processes)],
+            ))
+
+    rerun_seconds_by_mode = {
+        mode: [seconds for worker in workers for seconds in worker['rerun_seconds_by_mode'][mode]] for mode in modes
+    }
+    report = {
+        'settings': vars(args),
+        'all_modes': summarize([seconds for values in rerun_seconds_by_mode.values() for seconds in values]),
+        'by_mode': {mode: summarize(values) for mode, values in rerun_seconds_by_mode.items()},
+        'peak_rss_bytes_per_process': max(worker['peak_rss_bytes'] or 0 for worker in workers),
+        'elapsed_seconds': max(worker['elapsed_seconds'] for worker in workers),
+        'errors': [error for worker in workers for error in worker['errors']][:20],
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if report['errors']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
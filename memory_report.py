@@ -0,0 +1,92 @@
+import argparse
+import json
+import platform
+import tempfile
+import time
+import pandas as pd
+from utils_load_data import load_google_sheet, build_vocab_dataset, vocab_rating_cols
+from utils_memory import deep_nbytes
+from utils_synthetic import write_fixture_sheets
+
+# Memory footprint of the loaded vocab tables with the lean dtype schema, against the same tables with
+# pandas' default dtypes (object for text and labels, float64 for the ratings), on synthetic sheets.
+#   python memory_report.py --sizes 1000 100000 --output memory.json
+
+report_frames = ['df_raw', 'df_shared_char']
+
+
+def with_default_dtypes(df):
+    # What the loader produced before it enforced a schema
+    return df.astype({
+        col: 'float64' if col in vocab_rating_cols else object
+        for col in df.columns
+        if col in vocab_rating_cols or not pd.api.types.is_numeric_dtype(df[col])
+    })
+
+
+def column_bytes(df):
+    return {col: int(n_bytes) for col, n_bytes in df.memory_usage(deep=True, index=False).items()}
+
+
+def measure(n_rows, seed=0):
+    with tempfile.TemporaryDirectory() as directory:
+        vocab_path, _ = write_fixture_sheets(directory, n_rows, seed)
+        dataset = build_vocab_dataset(load_google_sheet(vocab_path), 'memory_report', time.time())
+    frames = {}
+    for name in report_frames:
+        df_lean = dataset[name]
+        df_default = with_default_dtypes(df_lean)
+        lean_bytes = column_bytes(df_lean)
+        default_bytes = column_bytes(df_default)
+        frames[name] = {
+            'n_rows': len(df_lean),
+            'default_bytes': sum(default_bytes.values()),
+            'lean_bytes': sum(lean_bytes.values()),
+            'columns': {
+                col: {
+                    'default_dtype': str(df_default[col].dtype),
+                    'lean_dtype': str(df_lean[col].dtype),
+                    'default_bytes': default_bytes[col],
+                    'lean_bytes': lean_bytes[col],
+                }
+                for col in df_lean.columns
+            },
+        }
+    return {'n_rows': n_rows, 'frames': frames, 'dataset_bytes': deep_nbytes(dataset)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the memory of the vocab tables with default and lean dtypes')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args()
+
+    results = []
+    for n_rows in args.sizes:
+        result = measure(n_rows, args.seed)
+        results.append(result)
+        for name, frame in result['frames'].items():
+            print(f"n_rows={n_rows:<8} {name:<16} {frame['default_bytes'] / 1e6:8.1f} MB -> {frame['lean_bytes'] / 1e6:8.1f} MB "
+                  f"({frame['lean_bytes'] / frame['default_bytes']:.0%})")
+            for col, sizes in sorted(frame['columns'].items(), key=lambda item: -item[1]['default_bytes']):
+                print(f"    {col:<22} {sizes['default_dtype']:>8} {sizes['default_bytes'] / 1e6:8.2f} MB -> "
+                      f"{sizes['lean_dtype']:<16} {sizes['lean_bytes'] / 1e6:8.2f} MB")
+        print(f"n_rows={n_rows:<8} whole dataset (lean)      {result['dataset_bytes'] / 1e6:8.1f} MB")
+
+    if args.output:
+        report = {
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'pandas': pd.__version__,
+            },
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
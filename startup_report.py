@@ -0,0 +1,102 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from utils_startup import import_time_breakdown
+
+# Cold-start report: import-time breakdown of the app's modules, and time to first paint of the
+# home screen in fresh processes (each runs app.py once headless with Streamlit's AppTest).
+#   python startup_report.py --repeats 5 --output startup.json
+#   python startup_report.py --output new.json --compare startup.json
+
+app_modules = ['streamlit', 'utils_cache', 'utils_scheduler', 'utils_events', 'utils_sessions', 'utils_startup', 'utils_timing']
+in_game_modules = ['utils_load_data', 'utils_compute', 'utils_render', 'utils_memory']
+
+_first_paint_code = '''
+import json, sys
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file('app.py', default_timeout=60).run()
+if at.exception:
+    sys.exit(at.exception[0].message)
+from utils_startup import startup_report
+print(json.dumps(startup_report()))
+'''
+
+
+def measure_first_paint(directory, n_repeats):
+    # Time from the first rerun's start to the rendered home screen, in a new process each time.
+    # The AppTest import isn't included (streamlit is already imported when `streamlit run` runs the script).
+    # The home screen prefetches the sheets in the background, so point it at small local ones
+    from utils_synthetic import write_fixture_sheets
+    vocab_path, english_path = write_fixture_sheets(directory, 1000)
+    env = {
+        **os.environ,
+        'COMBO_GAME_VOCAB_SHEET': vocab_path,
+        'COMBO_GAME_ENGLISH_SHEET': english_path,
+        'COMBO_GAME_DATA_DIR': os.path.join(directory, 'data'),
+        'COMBO_GAME_DEBUG': '',
+    }
+    reports = []
+    for _ in range(n_repeats):
+        result = subprocess.run([sys.executable, '-c', _first_paint_code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), env=env)
+        reports.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    paint_seconds = [report['first_rerun_to_paint_seconds'] for report in reports]
+    return {
+        'n_repeats': n_repeats,
+        'min_seconds': min(paint_seconds),
+        'median_seconds': statistics.median(paint_seconds),
+        'heavy_modules_loaded_at_first_paint': sorted({name for report in reports for name in report['heavy_modules_loaded_at_first_paint']}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the cold-start cost of the app')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    parser.add_argument('--compare', help='baseline JSON from an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown vs the baseline, as a fraction')
+    args = parser.parse_args()
+
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    imports = import_time_breakdown(app_modules + in_game_modules, cwd=cwd)
+    with tempfile.TemporaryDirectory() as directory:
+        first_paint = measure_first_paint(directory, args.repeats)
+
+    print('Import time (cumulative, in import order):')
+    for module, seconds in imports['modules'].items():
+        label = ' (deferred to game start)' if module in in_game_modules else ''
+        print(f'  {module:<18} {seconds * 1000:8.1f} ms{label}')
+    print(f"First paint of the home screen: median {first_paint['median_seconds'] * 1000:.1f} ms "
+          f"over {first_paint['n_repeats']} cold starts")
+    print(f"Heavy modules loaded at first paint: {', '.join(first_paint['heavy_modules_loaded_at_first_paint']) or 'none'}")
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        },
+        'imports': imports,
+        'first_paint': first_paint,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        baseline_seconds = baseline['first_paint']['median_seconds']
+        if first_paint['median_seconds'] > baseline_seconds * (1 + args.threshold):
+            print(f"REGRESSION first paint: {baseline_seconds * 1000:.1f} ms -> {first_paint['median_seconds'] * 1000:.1f} ms")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
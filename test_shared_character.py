@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+import pytest
+from collections import defaultdict
+from utils_load_data import (
+    load_google_sheet, compute_shared_character_df, compute_shared_character_options, shared_char_schema,
+)
+from utils_synthetic import write_fixture_sheets
+
+# The vectorized shared-character tables must match the original iterrows() implementation exactly.
+#   python -m pytest test_shared_character.py
+
+
+# Frozen copies of the original implementations (apart from the dtypes, which the loader now sets)
+def reference_shared_character_df(df):
+    shared_character_cols = [
+        ('chinese', 'english', 'pinyin', 'type'),
+        ('word1', 'word1_english'),
+        ('word2', 'word2_english'),
+        ('word3', 'word3_english'),
+        ('word4', 'word4_english'),
+    ]
+    all_words_list = defaultdict(list)
+
+    for _, row in df.iterrows():
+        for col_tuple in shared_character_cols:
+            all_words_list['chinese'].append(row[col_tuple[0]])
+            all_words_list['english'].append(row[col_tuple[1]])
+            if len(col_tuple) > 2:
+                all_words_list['pinyin'].append(row[col_tuple[2]])
+                all_words_list['type'].append(row[col_tuple[3]])
+            else:
+                all_words_list['pinyin'].append('')
+                all_words_list['type'].append('component_word')
+
+    df_all_words = pd.DataFrame(all_words_list).drop_duplicates(subset=['chinese']).reset_index(drop=True).dropna()
+
+    dict_all_shared_characters = defaultdict(list)
+    for _, row in df_all_words.iterrows():
+        for char in row['chinese']:
+            dict_all_shared_characters['shared_char'].append(char)
+            dict_all_shared_characters['chinese'].append(row['chinese'])
+            dict_all_shared_characters['english'].append(row['english'])
+            dict_all_shared_characters['pinyin'].append(row['pinyin'])
+            dict_all_shared_characters['type'].append(row['type'])
+    return pd.DataFrame(dict_all_shared_characters).drop_duplicates(subset=['shared_char', 'chinese']).reset_index(drop=True)
+
+
+def reference_shared_character_options(df_shared_char):
+    df_by_char = df_shared_char.groupby('shared_char').agg({
+        'chinese': lambda x: ';'.join(x),
+        'english': lambda x: ';'.join(x),
+        'pinyin': lambda x: ';'.join(x)
+    }).reset_index()
+    df_by_char['n_words'] = df_by_char['chinese'].apply(lambda x: len(x.split(';')))
+    return df_by_char.sort_values('n_words', ascending=False)
+
+
+def small_sheet_rows():
+    # Words repeated across rows and columns, a character repeated within a word, missing component words,
+    # and a component whose first occurrence has no English (dropped, even though a later one has it)
+    row = {
+        'id': 0, 'chinese': '', 'pinyin': '', 'english': '', 'type': 'combo', 'priority': 1, 'quality': 1,
+        'known': 1, 'known_pinyin_prompt': np.nan, 'known_english_prompt': np.nan, 'phonetic': np.nan,
+        'category1': 'food', 'category2': np.nan,
+        'word1': np.nan, 'word1_english': np.nan, 'word2': np.nan, 'word2_english': np.nan,
+        'word3': np.nan, 'word3_english': np.nan, 'word4': np.nan, 'word4_english': np.nan,
+        'reverse chinese': np.nan, 'date': np.nan,
+    }
+    return [
+        {**row, 'id': 1, 'chinese': '黄油', 'pinyin': 'huáng yóu', 'english': 'butter',
+         'word1': '黄', 'word1_english': 'yellow', 'word2': '油', 'word2_english': 'oil'},
+        {**row, 'id': 2, 'chinese': '保险', 'pinyin': 'bǎo xiǎn', 'english': 'insurance',
+         'word1': '保安', 'word1_english': np.nan, 'word2': '危险', 'word2_english': 'danger'},
+        {**row, 'id': 3, 'chinese': '保安', 'pinyin': 'bǎo ān', 'english': 'protect', 'type': 'two word',
+         'word1': '黄', 'word1_english': 'yellow (again)'},
+        {**row, 'id': 4, 'chinese': '谢谢', 'pinyin': 'xiè xie', 'english': 'thanks', 'type': 'single char',
+         'category1': np.nan},
+        {**row, 'id': 5, 'chinese': '油画', 'pinyin': 'yóu huà', 'english': 'oil painting',
+         'word1': '油', 'word1_english': 'oil', 'word2': '画画', 'word2_english': 'to draw',
+         'word3': '画', 'word3_english': 'painting', 'word4': '黄油', 'word4_english': 'butter'},
+        {**row, 'id': 6, 'chinese': '危险', 'pinyin': 'wēi xiǎn', 'english': 'danger', 'type': 'no combo'},
+        {**row, 'id': 7, 'chinese': '句子', 'pinyin': 'jù zi', 'english': 'sentence', 'type': 'sentence'},
+    ]
+
+
+@pytest.fixture(params=['small', 'synthetic'])
+def df_sheet(request, tmp_path):
+    if request.param == 'small':
+        vocab_path = tmp_path / 'vocab.csv'
+        pd.DataFrame(small_sheet_rows()).to_csv(vocab_path, index=False)
+    else:
+        vocab_path, _ = write_fixture_sheets(str(tmp_path), 500, 0)
+    return load_google_sheet(str(vocab_path))
+
+
+def test_shared_character_df_matches_reference(df_sheet):
+    expected = reference_shared_character_df(df_sheet).astype(shared_char_schema)
+    pd.testing.assert_frame_equal(compute_shared_character_df(df_sheet), expected)
+
+
+def test_shared_character_options_matches_reference(df_sheet):
+    expected = reference_shared_character_options(reference_shared_character_df(df_sheet))
+    pd.testing.assert_frame_equal(compute_shared_character_options(compute_shared_character_df(df_sheet)), expected)
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+from test_shared_character import small_sheet_rows
+from utils_load_data import load_google_sheet, build_vocab_dataset, update_vocab_dataset
+from utils_snapshot import compute_content_hash, compute_row_hashes
+from utils_synthetic import write_fixture_sheets
+
+# An incremental refresh must give the same dataset as building it from the new sheet.
+#   python -m pytest test_update_vocab_dataset.py
+
+
+def load_rows(tmp_path, rows, name):
+    path = tmp_path / f'{name}.csv'
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return load_google_sheet(str(path))
+
+
+def build(df_sheet):
+    return build_vocab_dataset(df_sheet, compute_content_hash(df_sheet), 0, compute_row_hashes(df_sheet))
+
+
+def update(dataset, df_sheet):
+    return update_vocab_dataset(dataset, df_sheet, compute_content_hash(df_sheet), 1, compute_row_hashes(df_sheet))
+
+
+def assert_same_dataset(dataset, expected):
+    for key in ['df_raw', 'df_shared_char', 'df_shared_char_options', 'df_shared_char_counts']:
+        pd.testing.assert_frame_equal(dataset[key], expected[key], check_categorical=False)
+    assert dataset['review_char_options'] == expected['review_char_options']
+    assert np.array_equal(dataset['shared_char_keys'], expected['shared_char_keys'])
+    index, expected_index = dataset['shared_char_index'], expected['shared_char_index']
+    assert index.positions.keys() == expected_index.positions.keys()
+    for char, positions in expected_index.positions.items():
+        assert np.array_equal(index.positions[char], positions), char
+        assert np.array_equal(index.positions_words_only[char], expected_index.positions_words_only[char]), char
+    graph, expected_graph = dataset['word_graph'], expected['word_graph']
+    for attribute in ['words', 'component_offsets', 'component_ids', 'used_in_offsets', 'used_in_ids']:
+        assert np.array_equal(getattr(graph, attribute), getattr(expected_graph, attribute)), attribute
+    assert dataset['pinyin_answer_index'].ids_by_key == expected['pinyin_answer_index'].ids_by_key
+    for query in ['pin', 'yīn', 'mean', 'meaning note', 'edited'] + expected['df_raw']['chinese'].tolist()[:20]:
+        results, n_results = dataset['search_index'].search(query, False)
+        expected_results, expected_n_results = expected['search_index'].search(query, False)
+        assert n_results == expected_n_results and np.array_equal(results, expected_results), query
+
+
+def edit_rows(df, rng, n_rows):
+    df = df.copy()
+    rows = df.index[rng.choice(len(df), n_rows, replace=False)]
+    df.loc[rows, 'english'] = [f'edited {i}' for i in range(n_rows)]
+    rows = df.index[rng.choice(len(df), n_rows, replace=False)]
+    df.loc[rows, 'word1'] = df['chinese'].to_numpy()[rng.choice(len(df), n_rows)]
+    rows = df.index[rng.choice(len(df), n_rows, replace=False)]
+    df.loc[rows, 'chinese'] = df.loc[rows, 'chinese'] + '新'
+    return df
+
+
+def delete_rows(df, rng, n_rows):
+    return df.drop(df.index[rng.choice(len(df), n_rows, replace=False)]).reset_index(drop=True)
+
+
+def insert_rows(df, rng, n_rows):
+    df_new = df.iloc[rng.choice(len(df), n_rows)].copy()
+    df_new['id'] = np.arange(df['id'].max() + 1, df['id'].max() + 1 + n_rows)
+    df_new['pinyin'] = 'xīn'
+    i_insert = len(df) // 2
+    return pd.concat([df.iloc[:i_insert], df_new, df.iloc[i_insert:]], ignore_index=True)
+
+
+def swap_rows(df, rng, n_rows):
+    order = np.arange(len(df))
+    rows = rng.choice(len(df), 2 * n_rows, replace=False)
+    order[rows[:n_rows]], order[rows[n_rows:]] = rows[n_rows:], rows[:n_rows]
+    return df.iloc[order].reset_index(drop=True)
+
+
+@pytest.fixture
+def df_synthetic(tmp_path):
+    vocab_path, _ = write_fixture_sheets(str(tmp_path), 500, 0)
+    return load_google_sheet(vocab_path)
+
+
+@pytest.mark.parametrize('change', [edit_rows, delete_rows, insert_rows, swap_rows])
+def test_update_matches_build(df_synthetic, change):
+    rng = np.random.default_rng(0)
+    dataset = build(df_synthetic)
+    df_sheet = df_synthetic
+    # Several refreshes in a row, so a wrong update would also show up in the ones after it
+    for _ in range(3):
+        df_sheet = change(df_sheet, rng, 5)
+        dataset = update(dataset, df_sheet)
+        assert_same_dataset(dataset, build(df_sheet))
+
+
+def test_update_after_reorder(tmp_path):
+    # Reversing the rows changes which occurrence of each word comes first, without changing any row
+    df_sheet = load_rows(tmp_path, small_sheet_rows(), 'before')
+    df_reversed = load_rows(tmp_path, small_sheet_rows()[::-1], 'after')
+    assert_same_dataset(update(build(df_sheet), df_reversed), build(df_reversed))
@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Cold loads started ahead of time (e.g. both sheets while the user is still on the home screen)
+_prefetch_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='dataset-prefetch')
+
+
+class DatasetCache:
+    # Process-wide cache for a loaded dataset, shared by every session.
+    # Once the TTL has passed, the stale copy keeps being served while a background thread reloads it.
+    # cold_loader, if given, fills the empty cache instead of loader (e.g. from a local snapshot).
+    # A dict value with a 'fetched_at' wall-clock timestamp counts its age from that time.
+    # refresher, if given, reloads from the current value (e.g. to apply only what changed) instead of loader.
+    def __init__(self, loader, ttl_seconds, cold_loader=None, refresher=None):
+        self.loader = loader
+        self.cold_loader = cold_loader
+        self.refresher = refresher
+        self.ttl_seconds = ttl_seconds
+        self.value = None
+        self.loaded_at = None
+        self.n_hits = 0
+        self.n_misses = 0
+        self.n_refreshes = 0
+        self.last_error = None
+        # _lock guards the state and is only held briefly; _load_lock is held for a whole cold load,
+        # so prefetch() and stats() never wait for a download
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._refresh_thread = None
+        self._prefetch_future = None
+
+    def prefetch(self):
+        # Start the cold load on the prefetch pool without waiting for it. A get() meanwhile blocks on
+        # the load lock until the prefetch is done, so the sheet is still only downloaded once.
+        with self._lock:
+            if self.value is not None or (self._prefetch_future is not None and not self._prefetch_future.done()):
+                return self._prefetch_future
+            self._prefetch_future = _prefetch_executor.submit(self._prefetch)
+            return self._prefetch_future
+
+    def _prefetch(self):
+        try:
+            self.get()
+        except Exception as e:
+            # The next get() retries on the caller's thread and raises there
+            with self._lock:
+                self.last_error = repr(e)
+
+    def get(self):
+        with self._lock:
+            if self.value is not None:
+                self.n_hits += 1
+                return self._value_refreshed_if_stale()
+        # Cold cache: load on this thread, other sessions wait on the load lock instead of loading again
+        with self._load_lock:
+            with self._lock:
+                if self.value is not None:
+                    self.n_hits += 1
+                    return self._value_refreshed_if_stale()
+                self.n_misses += 1
+            value = (self.cold_loader or self.loader)()
+            with self._lock:
+                self._set_value(value)
+                return self._value_refreshed_if_stale()
+
+    def _value_refreshed_if_stale(self):
+        # Called with the lock held
+        if self.is_stale() and not self.is_refreshing():
+            self._refresh_thread = threading.Thread(target=self._refresh, name='dataset-cache-refresh', daemon=True)
+            self._refresh_thread.start()
+        return self.value
+
+    def _set_value(self, value):
+        self.value = value
+        fetched_at = value.get('fetched_at') if isinstance(value, dict) else None
+        age = 0.0 if fetched_at is None else max(0.0, time.time() - fetched_at)
+        self.loaded_at = time.monotonic() - age
+
+    def is_stale(self):
+        return self.loaded_at is not None and time.monotonic() - self.loaded_at > self.ttl_seconds
+
+    def is_refreshing(self):
+        return self._refresh_thread is not None and self._refresh_thread.is_alive()
+
+    def _refresh(self):
+        try:
+            value = self.refresher(self.value) if self.refresher is not None else self.loader()
+        except Exception as e:
+            # Keep serving the stale copy and retry once the TTL passes again
+            with self._lock:
+                self.last_error = repr(e)
+                self.loaded_at = time.monotonic()
+            return
+        with self._lock:
+            self._set_value(value)
+            self.n_refreshes += 1
+            self.last_error = None
+
+    def stats(self):
+        with self._lock:
+            age = None if self.loaded_at is None else time.monotonic() - self.loaded_at
+            return {
+                'hits': self.n_hits,
+                'misses': self.n_misses,
+                'refreshes': self.n_refreshes,
+                'age_seconds': age,
+                'ttl_seconds': self.ttl_seconds,
+                'refreshing': self.is_refreshing(),
+                'prefetching': self._prefetch_future is not None and not self._prefetch_future.done(),
+                'last_error': self.last_error,
+            }
+
+
+class LRUCache:
+    # Small thread-safe least-recently-used cache, shared by all sessions in the process
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.n_hits = 0
+        self.n_misses = 0
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._values:
+                self.n_hits += 1
+                self._values.move_to_end(key)
+                return self._values[key]
+            self.n_misses += 1
+        # Computed outside the lock; two sessions racing on the same key just both compute it
+        value = compute()
+        with self._lock:
+            self._values[key] = value
+            self._values.move_to_end(key)
+            while len(self._values) > self.max_size:
+                self._values.popitem(last=False)
+        return value
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._values
+
+    def __len__(self):
+        return len(self._values)
+
+    def values(self):
+        with self._lock:
+            return list(self._values.values())
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.n_hits, 'misses': self.n_misses, 'size': len(self._values), 'max_size': self.max_size}
@@ -1,65 +1,157 @@
 import streamlit as st
 import pandas as pd
 import re
+import unicodedata
+from utils_timing import timed
 
 
-def compute_number_of_component_words():
-    if not pd.isna(st.session_state['problem_row']['word4']):
+def count_component_words(problem_row):
+    if not pd.isna(problem_row['word4']):
         return 4
-    elif not pd.isna(st.session_state['problem_row']['word3']):
+    elif not pd.isna(problem_row['word3']):
         return 3
-    elif not pd.isna(st.session_state['problem_row']['word2']):
+    elif not pd.isna(problem_row['word2']):
         return 2
     else:
         return 0
 
 
+@timed
+def compute_number_of_component_words():
+    return count_component_words(st.session_state['problem_row'])
+
+
+class _SuffixAutomaton:
+    # Suffix automaton of a string: built in O(len(text)), then finds the longest substring shared
+    # with any other string in O(len(other)), instead of checking every pair of start positions
+    def __init__(self, text):
+        self.transitions = [{}]
+        self.suffix_link = [-1]
+        self.length = [0]
+        last = 0
+        for char in text:
+            current = self._add_state(self.length[last] + 1, {}, 0)
+            state = last
+            while state != -1 and char not in self.transitions[state]:
+                self.transitions[state][char] = current
+                state = self.suffix_link[state]
+            if state != -1:
+                next_state = self.transitions[state][char]
+                if self.length[state] + 1 == self.length[next_state]:
+                    self.suffix_link[current] = next_state
+                else:
+                    clone = self._add_state(self.length[state] + 1, dict(self.transitions[next_state]), self.suffix_link[next_state])
+                    while state != -1 and self.transitions[state].get(char) == next_state:
+                        self.transitions[state][char] = clone
+                        state = self.suffix_link[state]
+                    self.suffix_link[next_state] = clone
+                    self.suffix_link[current] = clone
+            last = current
+
+    def _add_state(self, length, transitions, suffix_link):
+        self.transitions.append(transitions)
+        self.suffix_link.append(suffix_link)
+        self.length.append(length)
+        return len(self.length) - 1
+
+    def longest_common_substring(self, other):
+        state, match_length, longest_length, longest_end = 0, 0, 0, 0
+        for i_char, char in enumerate(other):
+            while state != 0 and char not in self.transitions[state]:
+                state = self.suffix_link[state]
+                match_length = self.length[state]
+            if char in self.transitions[state]:
+                state = self.transitions[state][char]
+                match_length += 1
+            if match_length > longest_length:
+                longest_length, longest_end = match_length, i_char + 1
+        return other[longest_end - longest_length:longest_end]
+
+
 def _longest_common_substring(s1, s2):
-    longest = ""
-    for i in range(len(s1)):
-        for j in range(len(s2)):
-            lcs_temp = 0
-            match = ""
-            while (i + lcs_temp < len(s1)) and (j + lcs_temp < len(s2)) and (s1[i + lcs_temp] == s2[j + lcs_temp]):
-                match += s1[i + lcs_temp]
-                lcs_temp += 1
-            if len(match) > len(longest):
-                longest = match
-    return longest
-    
+    return _SuffixAutomaton(s2).longest_common_substring(s1)
 
-def evaluate_english_guess(guess, correct_options):
-    # Force lowercase and parse multiple english translation options
-    guess = guess.lower()
-    correct_options = correct_options.lower()
-    correct_options_list = correct_options.split(';')
-
-    # Ignore anything in parentheses in english translation and trim
-    guess = re.sub(r'\s*\([^)]*\)', '', guess).strip()
-    
-    # Mark as correct if the longest shared substring between the guess and any correct option is:
+
+def _normalize_english(text):
+    # Force lowercase, ignore anything in parentheses and trim
+    text = unicodedata.normalize('NFC', text).lower()
+    return re.sub(r'\s*\([^)]*\)', '', text).strip()
+
+
+def compile_english_answer_key(correct_options):
+    # Normalized ';'-separated translation options, computed once per row when the data is loaded
+    return tuple(_normalize_english(correct_option) for correct_option in correct_options.split(';'))
+
+
+def compile_chinese_answer_key(chinese):
+    # NFKC folds full-width and compatibility forms into the characters the sheet uses; spaces are dropped
+    return ''.join(unicodedata.normalize('NFKC', chinese).split())
+
+
+def _is_close_match(guess_automaton, guess, correct_option):
+    # Mark as correct if the longest shared substring between the guess and the correct option is:
     # > 50% in length for both guess and answer
     # > 75% in length for either guess and answer
-    for correct_option in correct_options_list:
-        longest_substr = _longest_common_substring(correct_option, guess)
-        if len(longest_substr) > (0.75 * len(guess)) or len(longest_substr) > (0.75 * len(correct_option)):
-            return True
-        if len(longest_substr) > (0.5 * len(guess)) and len(longest_substr) > (0.5 * len(correct_option)):
-            return True
-        
-    return False
-    
+    n_shared = len(guess_automaton.longest_common_substring(correct_option))
+    if n_shared > (0.75 * len(guess)) or n_shared > (0.75 * len(correct_option)):
+        return True
+    return n_shared > (0.5 * len(guess)) and n_shared > (0.5 * len(correct_option))
+
+
+@timed
+def evaluate_english_guess_with_key(guess, answer_key):
+    # The guess is shared by every option, so it is indexed once and each option is scanned against it
+    guess = _normalize_english(guess)
+    guess_automaton = _SuffixAutomaton(guess)
+    return any(_is_close_match(guess_automaton, guess, correct_option) for correct_option in answer_key)
+
+
+@timed
+def evaluate_english_guess(guess, correct_options):
+    return evaluate_english_guess_with_key(guess, compile_english_answer_key(correct_options))
+
+
+@timed
+def evaluate_chinese_guess_with_key(guess, answer_key, pinyin_index=None, word_id=None):
+    # Hanzi are compared normalized; with a PinyinAnswerIndex, the word's pinyin (tones optional) is right too
+    if compile_chinese_answer_key(guess) == answer_key:
+        return True
+    return pinyin_index is not None and pinyin_index.matches(guess, word_id)
+
+
+@timed
+def evaluate_english_guesses(guesses_and_answers):
+    # Grade many (guess, correct_options) pairs at once, e.g. to replay logged guesses.
+    # Automata are shared between pairs with the same normalized guess, answer keys between equal answers.
+    guess_automata = {}
+    answer_keys = {}
+    results = []
+    for guess, correct_options in guesses_and_answers:
+        guess = _normalize_english(guess)
+        if guess not in guess_automata:
+            guess_automata[guess] = _SuffixAutomaton(guess)
+        if correct_options not in answer_keys:
+            answer_keys[correct_options] = compile_english_answer_key(correct_options)
+        results.append(any(
+            _is_close_match(guess_automata[guess], guess, correct_option)
+            for correct_option in answer_keys[correct_options]
+        ))
+    return results
+
 
+@timed
 def compute_guess_result():
     if st.session_state['gameplay_option'] == 'english':
         if st.session_state['prompt_type_english'] == '中文':
-            return evaluate_english_guess(st.session_state['current_english_guess'], st.session_state['problem_row']['english'])
+            return evaluate_english_guess_with_key(st.session_state['current_english_guess'], st.session_state['problem_row']['english_key'])
         else:
-            return (st.session_state['combo_word_guess'] == st.session_state['problem_row']['chinese'])
+            return evaluate_chinese_guess_with_key(st.session_state['combo_word_guess'], st.session_state['problem_row']['chinese_key'])
     if st.session_state['gameplay_option'] == 'vocab':
         if st.session_state['prompt_show_chinese'] == 'Yes':
-            return evaluate_english_guess(st.session_state['current_english_guess'], st.session_state['problem_row']['english'])
+            return evaluate_english_guess_with_key(st.session_state['current_english_guess'], st.session_state['problem_row']['english_key'])
         else:
-            return (st.session_state['combo_word_guess'] == st.session_state['problem_row']['chinese'])
+            return evaluate_chinese_guess_with_key(
+                st.session_state['combo_word_guess'], st.session_state['problem_row']['chinese_key'],
+                st.session_state['dataset']['pinyin_answer_index'], int(st.session_state['problem_row']['id']))
     else:
         raise ValueError(f"Gameplay option '{st.session_state['gameplay_option']}' not yet supported")
@@ -0,0 +1,64 @@
+import os
+
+
+# Data sources. Either can be pointed at a local CSV file (e.g. a test fixture) instead of Google Sheets
+vocab_sheet_url = os.environ.get(
+    'COMBO_GAME_VOCAB_SHEET',
+    'https://docs.google.com/spreadsheets/d/1pw9EAIvtiWenPDBFBIf7pwTh0FvIbIR0c3mY5gJwlDk/export?format=csv&gid=0',
+)
+english_sheet_url = os.environ.get(
+    'COMBO_GAME_ENGLISH_SHEET',
+    'https://docs.google.com/spreadsheets/d/1pw9EAIvtiWenPDBFBIf7pwTh0FvIbIR0c3mY5gJwlDk/export?format=csv&gid=47045332',
+)
+
+# Seconds before the process-wide dataset cache is refreshed in the background
+dataset_cache_ttl_seconds = float(os.environ.get('COMBO_GAME_CACHE_TTL', 600))
+
+# Local directory for on-disk state (sheet snapshots etc.)
+data_dir = os.environ.get('COMBO_GAME_DATA_DIR', '.combo_game')
+
+# Snapshots younger than this are served on a cold start (and then refreshed in the background)
+snapshot_max_age_seconds = float(os.environ.get('COMBO_GAME_SNAPSHOT_MAX_AGE', 7 * 24 * 3600))
+
+# Number of filtered decks (one per distinct settings tuple) kept in memory
+deck_cache_size = int(os.environ.get('COMBO_GAME_DECK_CACHE_SIZE', 256))
+
+# Show cache, memory and timing diagnostics in the sidebar
+debug_panel = os.environ.get('COMBO_GAME_DEBUG', '') == '1'
+
+# Time app reruns and the data helpers (near zero overhead when off), and optionally dump the report on exit
+timing_enabled = os.environ.get('COMBO_GAME_TIMING', '') == '1'
+timing_report_path = os.environ.get('COMBO_GAME_TIMING_REPORT', '')
+
+# Number of rendered feedback panels (per word and display setting) kept in memory
+panel_cache_size = int(os.environ.get('COMBO_GAME_PANEL_CACHE_SIZE', 4096))
+
+# While a prompt is on screen, the panels of the current word and this many next words in the deck are
+# built in the background (COMBO_GAME_PANEL_PREFETCH=0 turns it off)
+panel_prefetch_words = int(os.environ.get('COMBO_GAME_PANEL_PREFETCH', 3))
+panel_prefetch_workers = int(os.environ.get('COMBO_GAME_PANEL_PREFETCH_WORKERS', 2))
+
+# Spaced-repetition scheduler: new words are spread this far apart in due time, so a word answered
+# wrongly (due again after the relearn delay) comes back after a few other words
+scheduler_new_word_spacing_seconds = float(os.environ.get('COMBO_GAME_NEW_WORD_SPACING', 30))
+scheduler_relearn_seconds = float(os.environ.get('COMBO_GAME_RELEARN_SECONDS', 60))
+
+# Guess event log, written in batches by a background thread (COMBO_GAME_EVENT_LOG=0 turns it off)
+event_log_enabled = os.environ.get('COMBO_GAME_EVENT_LOG', '1') == '1'
+event_batch_size = int(os.environ.get('COMBO_GAME_EVENT_BATCH_SIZE', 200))
+event_flush_interval_seconds = float(os.environ.get('COMBO_GAME_EVENT_FLUSH_SECONDS', 2))
+event_queue_size = int(os.environ.get('COMBO_GAME_EVENT_QUEUE_SIZE', 100000))
+
+# A refresh that changed more than this fraction of the vocab sheet's rows rebuilds the derived tables
+# instead of editing them
+incremental_refresh_max_changed_fraction = float(os.environ.get('COMBO_GAME_INCREMENTAL_MAX_CHANGED', 0.25))
+
+# Where each browser session's game state (settings, deck position, score) is kept so a reload, a restarted
+# server or another worker process can resume it: 'sqlite' (default), 'file' (one JSON file per session)
+# or 'off' (only in the server process). Sessions not seen for COMBO_GAME_SESSION_TTL seconds are dropped.
+session_store_kind = os.environ.get('COMBO_GAME_SESSION_STORE', 'sqlite')
+session_ttl_seconds = float(os.environ.get('COMBO_GAME_SESSION_TTL', 30 * 24 * 3600))
+
+# Shared-character review mode: characters in the list need at least this many words; words shown per page
+review_min_words = int(os.environ.get('COMBO_GAME_REVIEW_MIN_WORDS', 10))
+review_page_size = int(os.environ.get('COMBO_GAME_REVIEW_PAGE_SIZE', 50))
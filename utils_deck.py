@@ -0,0 +1,56 @@
+import pandas as pd
+
+
+class RecordTable:
+    # Read-only column arrays of a loaded sheet, shared by every deck built on it.
+    # Rows come out as plain dicts, which are much cheaper to build than a pandas Series.
+    def __init__(self, df):
+        self.columns = list(df.columns)
+        self.arrays = []
+        for col in self.columns:
+            if isinstance(df[col].dtype, pd.StringDtype):
+                # Arrow-backed strings stay as they are: an object copy would cost more memory than the table
+                self.arrays.append(df[col].array)
+                continue
+            array = df[col].to_numpy()
+            if array.flags.writeable:
+                array = array.view()
+                array.flags.writeable = False
+            self.arrays.append(array)
+
+    def __len__(self):
+        return len(self.arrays[0]) if self.arrays else 0
+
+    def record(self, row_position):
+        return {col: array[row_position] for col, array in zip(self.columns, self.arrays)}
+
+
+class Deck:
+    # One game's play order: an int32 permutation of row positions in a shared RecordTable, plus a cursor.
+    # Advancing, skipping and jumping are O(1); resuming only needs the positions and the cursor.
+    def __init__(self, table, positions, position=0):
+        self.table = table
+        self.positions = positions
+        self.position = position
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, deck_index):
+        return self.table.record(self.positions[deck_index])
+
+    def is_finished(self):
+        return self.position >= len(self.positions)
+
+    def current(self):
+        return self[self.position]
+
+    def upcoming(self, n_words):
+        # Records of the current word and the ones after it, up to n_words in all
+        return [self[deck_index] for deck_index in range(self.position, min(self.position + n_words, len(self.positions)))]
+
+    def advance(self, n_words=1):
+        self.position += n_words
+
+    def jump(self, deck_index):
+        self.position = deck_index
@@ -0,0 +1,133 @@
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from utils_config import data_dir, event_batch_size, event_flush_interval_seconds, event_queue_size
+
+# Write-behind log of every guess. Sessions only put events on an in-memory queue (never blocking);
+# one background thread per process appends them to a WAL-mode SQLite database in batches.
+
+_event_columns = (
+    'event_id', 'recorded_at', 'session_id', 'gameplay_option', 'word_id', 'word', 'guess', 'correct',
+    'latency_seconds', 'corrected',
+)
+_stop = object()
+
+
+class GuessEventWriter:
+    def __init__(self, path=None, batch_size=event_batch_size, flush_interval_seconds=event_flush_interval_seconds,
+                 max_queue_size=event_queue_size):
+        self.path = path or os.path.join(data_dir, 'guess_events.sqlite3')
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self._queue = queue.Queue(max_queue_size)
+        self._lock = threading.Lock()
+        self.n_queued = 0
+        self.n_dropped = 0
+        self.n_written = 0
+        self.n_batches = 0
+        self.last_error = None
+        self._thread = threading.Thread(target=self._run, name='guess-event-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _connect(self):
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS guess_events ('
+            ' event_id TEXT PRIMARY KEY, recorded_at REAL NOT NULL, session_id TEXT, gameplay_option TEXT,'
+            ' word_id INTEGER, word TEXT, guess TEXT, correct INTEGER NOT NULL, latency_seconds REAL,'
+            ' corrected INTEGER NOT NULL DEFAULT 0)'
+        )
+        connection.commit()
+        return connection
+
+    def _put(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            # Losing an event is better than making a Submit click wait on the disk
+            with self._lock:
+                self.n_dropped += 1
+            return False
+        with self._lock:
+            self.n_queued += 1
+        return True
+
+    def log_guess(self, session_id, gameplay_option, word_id, word, guess, correct, latency_seconds):
+        # Returns the event id, to pass to log_correction() later
+        event_id = uuid.uuid4().hex
+        self._put(('insert', (
+            event_id, time.time(), session_id, gameplay_option, word_id, word, guess, int(bool(correct)),
+            latency_seconds, 0,
+        )))
+        return event_id
+
+    def log_correction(self, event_id):
+        # The guess was "wrongly marked as incorrect": mark it corrected (and right)
+        self._put(('correct', (event_id,)))
+
+    def _write_batch(self, connection, batch):
+        # Inserts and corrections are applied in order, in one transaction per batch
+        with connection:
+            for action, params in batch:
+                if action == 'insert':
+                    connection.execute(
+                        f"INSERT OR IGNORE INTO guess_events ({', '.join(_event_columns)}) VALUES ({', '.join('?' * len(_event_columns))})",
+                        params)
+                else:
+                    connection.execute('UPDATE guess_events SET corrected = 1, correct = 1 WHERE event_id = ?', params)
+        with self._lock:
+            self.n_written += len(batch)
+            self.n_batches += 1
+
+    def _run(self):
+        try:
+            connection = self._connect()
+        except Exception as error:
+            self.last_error = repr(error)
+            return
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval_seconds)
+                # Collect what else is already waiting, up to one batch
+                while item is not _stop:
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    item = self._queue.get_nowait()
+                stopping = item is _stop
+            except queue.Empty:
+                pass
+            if batch:
+                try:
+                    self._write_batch(connection, batch)
+                except sqlite3.Error as error:
+                    self.last_error = repr(error)
+        connection.close()
+
+    def close(self, timeout=10):
+        # Flush everything queued so far and stop the writer thread
+        if self._thread.is_alive():
+            self._queue.put(_stop)
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': self.n_queued,
+                'written': self.n_written,
+                'dropped': self.n_dropped,
+                'batches': self.n_batches,
+                'pending': self._queue.qsize(),
+                'last_error': self.last_error,
+            }
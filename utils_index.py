@@ -0,0 +1,502 @@
+import bisect
+import functools
+import itertools
+import re
+import unicodedata
+import numpy as np
+import pandas as pd
+
+_tone_number = re.compile(r'(?<=[a-z])[1-5]')
+_letters = re.compile(r'[a-z]+')
+_letters_and_digits = re.compile(r'[a-z0-9]+')
+
+
+class SharedCharIndex:
+    # Inverted index from each character to the row positions in df_shared_char of the words containing it.
+    # Built once per dataset so lookups cost O(matches) instead of a scan of the whole table.
+    def __init__(self, df_shared_char):
+        self._set_columns(df_shared_char)
+        # Integer code of each row's word, so excluding words is one np.isin over the matches
+        self.word_codes, words = pd.factorize(self.chinese)
+        self.word_code_by_word = dict(zip(words.tolist(), range(len(words))))
+        # Rows grouped by character (in order of first appearance), ascending within each group
+        char_codes, chars = pd.factorize(df_shared_char['shared_char'])
+        order = np.argsort(char_codes, kind='stable').astype(np.int32)
+        ends = np.cumsum(np.bincount(char_codes, minlength=len(chars))).tolist()
+        self.positions = {char: order[start:end] for char, start, end in zip(chars.tolist(), [0] + ends, ends)}
+        self.positions_words_only = {
+            char: positions[~self.is_phrase[positions]] for char, positions in self.positions.items()
+        }
+
+    def _set_columns(self, df_shared_char):
+        self.df_shared_char = df_shared_char
+        # The table's own (Arrow-backed) string arrays, rather than object copies of them
+        self.chinese = df_shared_char['chinese'].array
+        self.english = df_shared_char['english'].array
+        self.pinyin = df_shared_char['pinyin'].array
+        self.has_pinyin = self.pinyin != ''
+        self.is_phrase = df_shared_char['type'].isin(['phrase', 'phrase_save']).to_numpy()
+
+    def word_rows(self, words):
+        # Mask of the rows belonging to any of the words
+        codes = [self.word_code_by_word[word] for word in words if word in self.word_code_by_word]
+        return np.isin(self.word_codes, codes)
+
+    def updated(self, df_shared_char, old_to_new, new_rows, affected_chars):
+        # Index of an edited df_shared_char without a full rebuild. old_to_new maps each row position in
+        # the old table to its position in the new one (-1 if the row was removed), and new_rows are the
+        # positions of the rows that weren't in the old table. Only the characters in affected_chars may
+        # have gained or lost rows, and the rows of every other character keep their relative order.
+        index = SharedCharIndex.__new__(SharedCharIndex)
+        index._set_columns(df_shared_char)
+
+        index.word_code_by_word = dict(self.word_code_by_word)
+        index.word_codes = np.full(len(df_shared_char), -1, dtype=self.word_codes.dtype)
+        is_kept = old_to_new >= 0
+        index.word_codes[old_to_new[is_kept]] = self.word_codes[is_kept]
+        new_positions = np.flatnonzero(index.word_codes < 0)
+        for position, word in zip(new_positions.tolist(), index.chinese[new_positions].tolist()):
+            index.word_codes[position] = index.word_code_by_word.setdefault(word, len(index.word_code_by_word))
+
+        index.positions = {
+            char: old_to_new[positions].astype(np.int32) for char, positions in self.positions.items() if char not in affected_chars
+        }
+        index.positions_words_only = {
+            char: old_to_new[positions].astype(np.int32) for char, positions in self.positions_words_only.items() if char not in affected_chars
+        }
+        affected_positions = [old_to_new[self.positions[char]] for char in affected_chars if char in self.positions]
+        affected_positions = np.concatenate(affected_positions + [np.asarray(new_rows, dtype=np.int64)])
+        affected_positions = np.sort(affected_positions[affected_positions >= 0])
+        char_codes, chars = pd.factorize(df_shared_char['shared_char'].array[affected_positions])
+        affected_positions = affected_positions[np.argsort(char_codes, kind='stable')].astype(np.int32)
+        ends = np.cumsum(np.bincount(char_codes, minlength=len(chars))).tolist()
+        for char, start, end in zip(chars.tolist(), [0] + ends, ends):
+            positions = affected_positions[start:end]
+            index.positions[char] = positions
+            index.positions_words_only[char] = positions[~index.is_phrase[positions]]
+        return index
+
+    def char_rows(self, chars):
+        # Row positions of the words containing any of the characters, in table order
+        positions = [self.positions[char] for char in chars if char in self.positions]
+        return np.sort(np.concatenate(positions)) if positions else np.empty(0, dtype=np.int32)
+
+    def lookup(self, char, words_only=False, require_pinyin=False, exclude=()):
+        positions = (self.positions_words_only if words_only else self.positions).get(char)
+        if positions is None:
+            return np.empty(0, dtype=np.int32)
+        if require_pinyin:
+            positions = positions[self.has_pinyin[positions]]
+        if exclude:
+            excluded_codes = [self.word_code_by_word[word] for word in set(exclude) if word in self.word_code_by_word]
+            if excluded_codes:
+                positions = positions[~np.isin(self.word_codes[positions], excluded_codes)]
+        return positions
+
+
+def _strip_marks(text):
+    # Lowercase, without tone marks or other accents: 'Nǚ rén' becomes 'nu ren'
+    text = text.lower()
+    if not text.isascii():
+        text = ''.join(c for c in unicodedata.normalize('NFD', text) if not unicodedata.combining(c))
+    return text
+
+
+@functools.lru_cache(maxsize=4096)
+def _pinyin_syllables(text):
+    # Pinyin comes from a few hundred distinct syllables, so most calls are cache hits.
+    # Tone numbers split syllables too: 'nv3ren2' is 'nv', 'ren'.
+    return _letters.findall(_strip_marks(text))
+
+
+def pinyin_tokens(pinyin):
+    # Each syllable, and the whole word without spaces so 'baoxian' finds 'bǎo xiǎn'
+    syllables = [syllable for text in pinyin.split() for syllable in _pinyin_syllables(text)]
+    return set(syllables) | {''.join(syllables)} if syllables else set()
+
+
+def english_tokens(english):
+    return set(_letters_and_digits.findall(_strip_marks(english)))
+
+
+def char_ngrams(word):
+    # Characters and character pairs
+    return set(word) | {word[i:i + 2] for i in range(len(word) - 1)}
+
+
+def _map_distinct(function, values):
+    # pd.factorize() takes arrays, not lists
+    if isinstance(values, list):
+        values = np.asarray(values, dtype=object)
+    value_ids, distinct_values = pd.factorize(values, use_na_sentinel=False)
+    results = [function(value) for value in distinct_values.tolist()]
+    return [results[value_id] for value_id in value_ids]
+
+
+def _edit_sorted(values, added, removed):
+    # Copy of a sorted list with values added and removed: in place for a few, else by sorting again
+    if len(added) + len(removed) > 64:
+        removed = set(removed)
+        return sorted([value for value in values if value not in removed] + added)
+    values = list(values)
+    for value in removed:
+        del values[bisect.bisect_left(values, value)]
+    for value in added:
+        bisect.insort(values, value)
+    return values
+
+
+def _is_chinese(text):
+    return any(ord(c) >= 0x2e80 for c in text)
+
+
+# Prefix matches for one query term stop after this many index tokens, so a one-letter term stays cheap
+_max_prefix_tokens = 200
+
+
+class WordSearchIndex:
+    # Search over the distinct words of df_shared_char by any part of the word (character n-grams), by
+    # pinyin without tones, or by English. Postings are arrays of the word codes of a SharedCharIndex,
+    # so a query costs O(matches) and an edited sheet only touches the postings of its words.
+    # Component words have no pinyin of their own; they use the pinyin of the same word's row in the raw sheet.
+    def __init__(self, shared_char_index, df_raw):
+        self.shared_char_index = shared_char_index
+        self._set_word_rows()
+        codes = np.flatnonzero(self.first_row >= 0)
+        self.raw_pinyin = self._raw_pinyin(df_raw, codes)
+        self.postings = {}
+        for kind, tokens_by_code in self._tokens(codes).items():
+            lengths = np.fromiter(map(len, tokens_by_code), dtype=np.int64, count=len(codes))
+            token_codes = np.repeat(codes, lengths).astype(np.int32)
+            token_ids, tokens = pd.factorize(np.fromiter(itertools.chain.from_iterable(tokens_by_code), dtype=object, count=lengths.sum()))
+            # Group the word codes by token; codes stay ascending within each group
+            order = np.argsort(token_ids, kind='stable')
+            token_codes = token_codes[order]
+            ends = np.cumsum(np.bincount(token_ids, minlength=len(tokens))).tolist()
+            self.postings[kind] = {token: token_codes[start:end] for token, start, end in zip(tokens.tolist(), [0] + ends, ends)}
+        self._sort_tokens()
+
+    def _set_word_rows(self):
+        # First row in df_shared_char of each word code (-1 for codes of words no longer in the table)
+        word_codes = self.shared_char_index.word_codes
+        self.first_row = np.full(len(self.shared_char_index.word_code_by_word), -1, dtype=np.int64)
+        self.first_row[word_codes[::-1]] = np.arange(len(word_codes))[::-1]
+        row_lengths = self.shared_char_index.df_shared_char['chinese'].str.len().to_numpy(dtype=np.int64)
+        self.word_length = np.zeros(len(self.first_row), dtype=np.int64)
+        has_row = self.first_row >= 0
+        self.word_length[has_row] = row_lengths[self.first_row[has_row]]
+
+    def _raw_pinyin(self, df_raw, codes):
+        # {word code: pinyin} for the words without pinyin in df_shared_char that have it in the raw sheet
+        codes = codes[~self.shared_char_index.has_pinyin[self.first_row[codes]]]
+        words = self.shared_char_index.chinese[self.first_row[codes]]
+        df_pinyin = df_raw.loc[(df_raw['pinyin'].fillna('') != '').to_numpy(), ['chinese', 'pinyin']].drop_duplicates('chinese')
+        raw_rows = pd.Index(df_pinyin['chinese']).get_indexer(words)
+        pinyin = df_pinyin['pinyin'].array
+        return {code: pinyin[raw_row] for code, raw_row in zip(codes.tolist(), raw_rows.tolist()) if raw_row >= 0}
+
+    def _tokens(self, codes):
+        # Tokens of each word, tokenizing each distinct pinyin and English text once
+        rows = self.first_row[codes]
+        words = self.shared_char_index.chinese[rows].tolist()
+        pinyin = [self.raw_pinyin.get(code) or value for code, value in zip(codes.tolist(), self.shared_char_index.pinyin[rows].tolist())]
+        return {
+            'chars': [char_ngrams(word) for word in words],
+            # First character and first two, for ranking words that start with the query
+            'starts': [{word[:1], word[:2]} for word in words],
+            'pinyin': _map_distinct(pinyin_tokens, pinyin),
+            'english': _map_distinct(english_tokens, self.shared_char_index.english[rows]),
+        }
+
+    def _sort_tokens(self):
+        self.sorted_tokens = {kind: sorted(self.postings[kind]) for kind in ('pinyin', 'english')}
+
+    def updated(self, shared_char_index, df_raw, affected_words):
+        # Index for the SharedCharIndex.updated() of an edited sheet, where only the words in affected_words
+        # may have been added, removed or changed
+        index = WordSearchIndex.__new__(WordSearchIndex)
+        index.shared_char_index = shared_char_index
+        index._set_word_rows()
+        old_codes = np.array([self.shared_char_index.word_code_by_word[word] for word in affected_words
+                              if word in self.shared_char_index.word_code_by_word], dtype=np.int64)
+        old_codes = old_codes[self.first_row[old_codes] >= 0]
+        new_codes = np.array(sorted(shared_char_index.word_code_by_word[word] for word in affected_words
+                                    if word in shared_char_index.word_code_by_word), dtype=np.int64)
+        new_codes = new_codes[index.first_row[new_codes] >= 0]
+        removed_codes = set(old_codes.tolist())
+        index.raw_pinyin = {code: pinyin for code, pinyin in self.raw_pinyin.items() if code not in removed_codes}
+        index.raw_pinyin.update(index._raw_pinyin(df_raw, new_codes))
+
+        old_tokens = self._tokens(old_codes)
+        new_tokens = index._tokens(new_codes)
+        is_old_code = np.zeros(len(self.first_row), dtype=bool)
+        is_old_code[old_codes] = True
+        index.postings = {}
+        index.sorted_tokens = {}
+        for kind, postings in self.postings.items():
+            codes_by_token = {}
+            for code, tokens in zip(new_codes, new_tokens[kind]):
+                for token in tokens:
+                    codes_by_token.setdefault(token, []).append(code)
+            old_token_set = set().union(*old_tokens[kind])
+            postings = dict(postings)
+            added_tokens, removed_tokens = [], []
+            for token in old_token_set | codes_by_token.keys():
+                codes = postings.get(token, np.empty(0, dtype=np.int32))
+                if token in old_token_set:
+                    codes = codes[~is_old_code[codes]]
+                if token in codes_by_token:
+                    codes = np.concatenate([codes, np.array(codes_by_token[token], dtype=np.int32)])
+                if token not in postings and len(codes):
+                    added_tokens.append(token)
+                elif token in postings and not len(codes):
+                    removed_tokens.append(token)
+                if len(codes):
+                    postings[token] = codes
+                else:
+                    postings.pop(token, None)
+            index.postings[kind] = postings
+            if kind in self.sorted_tokens:
+                index.sorted_tokens[kind] = _edit_sorted(self.sorted_tokens[kind], added_tokens, removed_tokens)
+        return index
+
+    def _prefix_postings(self, kind, term):
+        tokens = self.sorted_tokens[kind]
+        start = bisect.bisect_left(tokens, term)
+        end = bisect.bisect_left(tokens, term + '\U0010ffff', start, min(len(tokens), start + _max_prefix_tokens))
+        return [self.postings[kind][token] for token in tokens[start:end]]
+
+    def _search_chinese(self, query):
+        # Words containing the query; exact matches first, then words starting with it
+        postings = self.postings['chars']
+        empty = np.empty(0, dtype=np.int32)
+        if len(query) == 1:
+            codes = postings.get(query, empty)
+        else:
+            bigrams = sorted({query[i:i + 2] for i in range(len(query) - 1)}, key=lambda bigram: len(postings.get(bigram, ())))
+            codes = postings.get(bigrams[0], empty)
+            for bigram in bigrams[1:]:
+                codes = np.intersect1d(codes, postings.get(bigram, empty), assume_unique=True)
+            if len(query) > 2:
+                words = self.shared_char_index.chinese[self.first_row[codes]].tolist()
+                codes = codes[np.fromiter((query in word for word in words), dtype=bool, count=len(codes))]
+        if len(query) <= 2:
+            scores = np.isin(codes, self.postings['starts'].get(query, empty)).astype(np.int64)
+        else:
+            words = self.shared_char_index.chinese[self.first_row[codes]].tolist()
+            scores = np.fromiter((word.startswith(query) for word in words), dtype=np.int64, count=len(codes))
+        scores[codes == self.shared_char_index.word_code_by_word.get(query, -1)] = 2
+        return codes, scores
+
+    def _term_matches(self, term):
+        # Distinct word codes with a pinyin or English token equal to the term (score 2) or starting with it (1)
+        exact, prefix = [], []
+        for kind, token in (('pinyin', _tone_number.sub('', term)), ('english', term)):
+            if token in self.postings[kind]:
+                exact.append(self.postings[kind][token])
+            prefix += self._prefix_postings(kind, token)
+        n_matches = sum(map(len, exact + prefix))
+        if n_matches * 16 < len(self.first_row):
+            # Few matches: deduplicate by sorting, keeping the first (best) score of each code
+            codes = np.concatenate(exact + prefix + [np.empty(0, dtype=np.int32)])
+            scores = np.repeat([2] * len(exact) + [1] * len(prefix) + [0], [len(codes) for codes in exact + prefix] + [0])
+            codes, first = np.unique(codes, return_index=True)
+            return codes, scores[first]
+        # Many matches: scores in an array over all word codes, which is cheaper than sorting them
+        term_scores = np.zeros(len(self.first_row), dtype=np.int64)
+        for codes in prefix:
+            term_scores[codes] = 1
+        for codes in exact:
+            term_scores[codes] = 2
+        codes = np.flatnonzero(term_scores)
+        return codes, term_scores[codes]
+
+    def _search_terms(self, query):
+        # Words matching every term of the query as a pinyin syllable or an English word (or a prefix of one),
+        # scored by the sum of the term scores
+        terms = _letters_and_digits.findall(_strip_marks(query))
+        if not terms:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        codes, scores = self._term_matches(terms[0])
+        for term in terms[1:]:
+            term_codes, term_scores = self._term_matches(term)
+            codes, in_codes, in_term = np.intersect1d(codes, term_codes, assume_unique=True, return_indices=True)
+            scores = scores[in_codes] + term_scores[in_term]
+        return codes, scores
+
+    def search(self, query, words_only=False, limit=None):
+        # Row positions in df_shared_char of the matching words (one row per word), best match first:
+        # by score, then shorter words, then sheet order. With a limit only the best ones are sorted and
+        # returned. Also returns the number of matches.
+        query = query.strip()
+        if not query:
+            return np.empty(0, dtype=np.int64), 0
+        if _is_chinese(query):
+            codes, scores = self._search_chinese(''.join(query.split()))
+        else:
+            codes, scores = self._search_terms(query)
+        rows = self.first_row[codes]
+        keep = rows >= 0
+        if words_only:
+            keep &= ~self.shared_char_index.is_phrase[np.maximum(rows, 0)]
+        codes, scores, rows = codes[keep], scores[keep], rows[keep]
+        # One sort key: rows < 2**32 and words shorter than 256 characters
+        keys = ((scores.max(initial=0) - scores) << 40) | (np.minimum(self.word_length[codes], 255) << 32) | rows
+        if limit is not None and limit < len(keys):
+            keys = np.partition(keys, limit)[:limit]
+        return np.sort(keys) & 0xffffffff, len(rows)
+
+    def pinyin_of_rows(self, rows):
+        # Pinyin of the words at these row positions, filled in from the raw sheet where the table has none
+        codes = self.shared_char_index.word_codes[rows]
+        return [self.raw_pinyin.get(code) or pinyin for code, pinyin in zip(codes.tolist(), self.shared_char_index.pinyin[rows].tolist())]
+
+
+def _csr_neighbors(offsets, targets, nodes):
+    # Concatenated neighbor lists of the nodes, in one gather
+    starts = offsets[nodes]
+    lengths = offsets[nodes + 1] - starts
+    run_starts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return targets[run_starts + np.arange(lengths.sum())]
+
+
+class WordGraph:
+    # Combo words and the component words they are built from (word1..word4), as CSR arrays over word ids:
+    # the components of word i are component_ids[component_offsets[i]:component_offsets[i + 1]], and the words
+    # using word i as a component are used_in_ids[used_in_offsets[i]:used_in_offsets[i + 1]].
+    # A word's components come from its first row in the sheet, with count_component_words()'s rule.
+    def __init__(self, df_raw):
+        combo_words = df_raw['chinese'].to_numpy(dtype=object)
+        component_cols = [df_raw[f'word{i_word}'].to_numpy(dtype=object) for i_word in range(1, 5)]
+        n_components = np.select(
+            [~pd.isna(component_cols[3]), ~pd.isna(component_cols[2]), ~pd.isna(component_cols[1])], [4, 3, 2], 0)
+        n_components[pd.Series(combo_words).duplicated().to_numpy() | pd.isna(combo_words)] = 0
+
+        # Edges in row order, then component order
+        slot_is_used = np.arange(4)[None, :] < n_components[:, None]
+        components = np.stack(component_cols, axis=1)
+        slot_is_used &= ~pd.isna(components)
+        edge_targets = components[slot_is_used]
+        ids, self.words = pd.factorize(np.concatenate([combo_words, edge_targets]))
+        self.id_by_word = dict(zip(self.words.tolist(), range(len(self.words))))
+        n_words = len(self.words)
+        source_ids = np.repeat(ids[:len(combo_words)], slot_is_used.sum(axis=1)).astype(np.int32)
+        target_ids = ids[len(combo_words):].astype(np.int32)
+
+        # Sources are already grouped in row order; a stable sort keeps each word's components in order
+        order = np.argsort(source_ids, kind='stable')
+        self.component_offsets = np.concatenate([[0], np.cumsum(np.bincount(source_ids, minlength=n_words))]).astype(np.int32)
+        self.component_ids = target_ids[order]
+        order = np.argsort(target_ids, kind='stable')
+        self.used_in_offsets = np.concatenate([[0], np.cumsum(np.bincount(target_ids, minlength=n_words))]).astype(np.int32)
+        self.used_in_ids = source_ids[order]
+
+    def words_to_ids(self, words):
+        return np.fromiter((self.id_by_word[word] for word in words), dtype=np.int32, count=len(words))
+
+    def _neighbors(self, offsets, targets, word):
+        word_id = self.id_by_word.get(word)
+        if word_id is None:
+            return []
+        return self.words[targets[offsets[word_id]:offsets[word_id + 1]]].tolist()
+
+    def components(self, word):
+        return self._neighbors(self.component_offsets, self.component_ids, word)
+
+    def used_in(self, word):
+        # Words with this word as a direct component
+        return self._neighbors(self.used_in_offsets, self.used_in_ids, word)
+
+    def decompose(self, word, max_depth=None):
+        # (depth, word) for the word's components, their components and so on, depth first in component
+        # order. A word already on the path isn't expanded again, so a cycle in the sheet can't loop.
+        word_id = self.id_by_word.get(word)
+        if word_id is None:
+            return []
+        result = []
+        stack = [(component_id, 1, (word_id,)) for component_id in self.component_ids[self.component_offsets[word_id]:self.component_offsets[word_id + 1]][::-1]]
+        while stack:
+            node, depth, path = stack.pop()
+            result.append((depth, self.words[node]))
+            if node in path or (max_depth is not None and depth >= max_depth):
+                continue
+            children = self.component_ids[self.component_offsets[node]:self.component_offsets[node + 1]]
+            stack.extend((child, depth + 1, path + (node,)) for child in children[::-1])
+        return result
+
+    def _reachable(self, offsets, targets, words):
+        # Every word reachable from any of the words (themselves only through a cycle), one level per vectorized step
+        seen = np.zeros(len(self.words), dtype=bool)
+        frontier = np.unique(self.words_to_ids([word for word in words if word in self.id_by_word]))
+        while len(frontier):
+            neighbors = _csr_neighbors(offsets, targets, frontier)
+            frontier = np.unique(neighbors[~seen[neighbors]])
+            seen[frontier] = True
+        return self.words[np.flatnonzero(seen)].tolist()
+
+    def all_components(self, words):
+        # Components of the words at any depth
+        return self._reachable(self.component_offsets, self.component_ids, words)
+
+    def all_used_in(self, words):
+        # Words built from any of the words at any depth
+        return self._reachable(self.used_in_offsets, self.used_in_ids, words)
+
+
+_pinyin_reading_separators = re.compile(r'[;,/]')
+# Ids per key are kept in a tuple while there are few of them, a frozenset past that
+_max_tuple_ids = 16
+
+
+def pinyin_answer_key(text):
+    # Pinyin without tones, tone numbers, spaces or apostrophes, and with ü (also typed v or u:) as u:
+    # 'Bǎo xiǎn', "bao3 xian3" and 'baoxian' all give 'baoxian'
+    return ''.join(syllable for word in text.split() for syllable in _pinyin_syllables(word)).replace('v', 'u')
+
+
+def _pinyin_answer_keys(pinyin):
+    # One key per reading, for pinyin columns listing several ('hái; huán')
+    if not isinstance(pinyin, str):
+        return ()
+    if _pinyin_reading_separators.search(pinyin) is None:
+        key = pinyin_answer_key(pinyin)
+        return (key,) if key else ()
+    return tuple({key for key in map(pinyin_answer_key, _pinyin_reading_separators.split(pinyin)) if key})
+
+
+def _ids_value(ids):
+    return tuple(ids) if len(ids) <= _max_tuple_ids else frozenset(ids)
+
+
+class PinyinAnswerIndex:
+    # Sheet ids of the words each toneless pinyin key answers, so grading a pinyin guess for a Chinese
+    # answer is one dict lookup and a membership test instead of normalizing the row's pinyin per submit
+    def __init__(self, df_raw):
+        ids_by_key = {}
+        for word_id, keys in sorted(zip(df_raw['id'].tolist(), _map_distinct(_pinyin_answer_keys, df_raw['pinyin']))):
+            for key in keys:
+                ids_by_key.setdefault(key, []).append(word_id)
+        self.ids_by_key = {key: _ids_value(ids) for key, ids in ids_by_key.items()}
+
+    def updated(self, df_old, old_rows, df_new, new_rows):
+        # Index for an edited sheet where only the rows at old_rows (in df_old) were changed or removed
+        # and the rows at new_rows (in df_new) were changed or added. Ids must be unique in both sheets.
+        removed, added = {}, {}
+        for changes, df, rows in ((removed, df_old, old_rows), (added, df_new, new_rows)):
+            pinyin = df['pinyin'].array[rows].tolist()
+            for word_id, row_pinyin in zip(df['id'].to_numpy()[rows].tolist(), pinyin):
+                for key in _pinyin_answer_keys(row_pinyin):
+                    changes.setdefault(key, set()).add(word_id)
+        index = PinyinAnswerIndex.__new__(PinyinAnswerIndex)
+        index.ids_by_key = dict(self.ids_by_key)
+        for key in removed.keys() | added.keys():
+            ids = set(index.ids_by_key.get(key, ())) - removed.get(key, set()) | added.get(key, set())
+            if ids:
+                index.ids_by_key[key] = _ids_value(sorted(ids))
+            else:
+                index.ids_by_key.pop(key, None)
+        return index
+
+    def matches(self, guess, word_id):
+        key = pinyin_answer_key(guess)
+        return bool(key) and word_id in self.ids_by_key.get(key, ())
@@ -1,95 +1,466 @@
 import streamlit as st
 import numpy as np
 import pandas as pd
-from collections import defaultdict
+from utils_config import vocab_sheet_url, english_sheet_url, deck_cache_size, incremental_refresh_max_changed_fraction, review_min_words
+from utils_snapshot import fetch_with_snapshot, fetch_rows_with_snapshot, load_with_snapshot, compute_row_hashes
+from utils_index import PinyinAnswerIndex, SharedCharIndex, WordGraph, WordSearchIndex
+from utils_compute import compile_english_answer_key, compile_chinese_answer_key
+from utils_cache import LRUCache
+from utils_deck import RecordTable, Deck
+from utils_timing import timed
 
+# Deck row positions, keyed by (deck kind, dataset version, settings tuple)
+_deck_cache = LRUCache(deck_cache_size)
+
+# Explicit dtypes of the cleaned vocab sheet: Arrow-backed strings for text (with NaN for missing values,
+# like object columns), categories for the labels, and int8 for the 1-6 ratings
+lean_string_dtype = pd.StringDtype('pyarrow_numpy')
+vocab_types = ['combo', 'no combo', 'two word', 'suffix', 'single char', 'abbreviation', 'prefix', 'phrase', 'phrase_save']
+vocab_text_cols = [
+    'chinese', 'pinyin', 'english',
+    'word1', 'word1_english', 'word2', 'word2_english', 'word3', 'word3_english', 'word4', 'word4_english',
+    'reverse chinese', 'date',
+]
+vocab_rating_cols = ['priority', 'quality', 'known']
+vocab_schema = {
+    **{col: lean_string_dtype for col in vocab_text_cols},
+    'type': pd.CategoricalDtype(vocab_types),
+    'category1': 'category',
+    'category2': 'category',
+    **{col: 'int8' for col in vocab_rating_cols},
+}
+
+
+def apply_vocab_schema(df):
+    return df.astype(vocab_schema)
+
+
+# The shared-character table gets the same lean dtypes
+shared_char_schema = {
+    **{col: lean_string_dtype for col in ['shared_char', 'chinese', 'english', 'pinyin']},
+    'type': pd.CategoricalDtype(vocab_types + ['component_word']),
+}
+
+# Word columns of the sheet that feed the shared-character table, in the order words are taken from a row
+shared_character_cols = [
+    ('chinese', 'english', 'pinyin', 'type'),
+    ('word1', 'word1_english'),
+    ('word2', 'word2_english'),
+    ('word3', 'word3_english'),
+    ('word4', 'word4_english'),
+]
+
+
+def _words_from_cols(df, col_tuple):
+    # Text stays in the sheet's Arrow-backed arrays
+    return pd.DataFrame({
+        'chinese': df[col_tuple[0]].array,
+        'english': df[col_tuple[1]].array,
+        'pinyin': df[col_tuple[2]].array if len(col_tuple) > 2 else pd.array([''] * len(df), dtype=lean_string_dtype),
+        'type': df[col_tuple[3]].to_numpy(dtype=object) if len(col_tuple) > 2 else 'component_word',
+    })
+
+
+def _expand_shared_chars(df_all_words, word_keys):
+    # One row per distinct character of each (unique) word, in word order then character order.
+    # Words are unique here, so (shared_char, chinese) duplicates only come from a character repeated within a word.
+    words = df_all_words['chinese'].tolist()
+    word_lengths = np.fromiter(map(len, words), dtype=np.int64, count=len(words))
+    word_positions = np.repeat(np.arange(len(words)), word_lengths)
+    shared_chars = np.array(list(''.join(words)), dtype=object)
+    is_first_in_word = ~pd.DataFrame({
+        'word': word_positions,
+        'char': pd.factorize(shared_chars)[0],
+    }).duplicated().to_numpy()
+
+    df_shared_char = df_all_words.take(word_positions[is_first_in_word]).reset_index(drop=True)
+    df_shared_char.insert(0, 'shared_char', shared_chars[is_first_in_word])
+    return df_shared_char.astype(shared_char_schema), word_keys[word_positions[is_first_in_word]]
+
+
+def compute_shared_character_df_with_keys(df):
+    # Also returns each row's word key, row * len(shared_character_cols) + column slot of the word's first
+    # occurrence in the sheet, which orders the table and lets refresh_vocab_dataset() edit it in place
+    n_slots = len(shared_character_cols)
+    df_words_by_col = [_words_from_cols(df, col_tuple) for col_tuple in shared_character_cols]
+
+    # Interleave so words are in sheet order (each combo word followed by its components), then de-dup.
+    # The first occurrence of a word wins, even if it is then dropped for missing values.
+    word_order = np.arange(len(df) * n_slots).reshape(n_slots, len(df)).T.ravel()
+    df_all_words = pd.concat(df_words_by_col, ignore_index=True).take(word_order)
+    df_all_words = df_all_words.drop_duplicates(subset=['chinese']).dropna()
+    slots, rows = np.divmod(df_all_words.index.to_numpy(), len(df))
+    return _expand_shared_chars(df_all_words.reset_index(drop=True), rows * n_slots + slots)
+
+
+@timed
 def compute_shared_character_df(df):
     # Create a DataFrame to hold the shared characters and their associated words
-    shared_character_cols = [
-        ('chinese', 'english', 'pinyin', 'type'),
-        ('word1', 'word1_english'),
-        ('word2', 'word2_english'),
-        ('word3', 'word3_english'),
-        ('word4', 'word4_english'),
-    ]
-    all_words_list = defaultdict(list)
-    
-    for _, row in df.iterrows():
-        for col_tuple in shared_character_cols:
-            all_words_list['chinese'].append(row[col_tuple[0]])
-            all_words_list['english'].append(row[col_tuple[1]])
-            if len(col_tuple) > 2:
-                all_words_list['pinyin'].append(row[col_tuple[2]])
-                all_words_list['type'].append(row[col_tuple[3]])
-            else:
-                all_words_list['pinyin'].append('')
-                all_words_list['type'].append('component_word')
-
-    # de-dup all words list
-    df_all_words = pd.DataFrame(all_words_list).drop_duplicates(subset=['chinese']).reset_index(drop=True).dropna()
-    
-    # Compute new df, which is all characters in each word
-    dict_all_shared_characters = defaultdict(list)
-    for _, row in df_all_words.iterrows():
-        for char in row['chinese']:
-            dict_all_shared_characters['shared_char'].append(char)
-            dict_all_shared_characters['chinese'].append(row['chinese'])
-            dict_all_shared_characters['english'].append(row['english'])
-            dict_all_shared_characters['pinyin'].append(row['pinyin'])
-            dict_all_shared_characters['type'].append(row['type'])
-    return pd.DataFrame(dict_all_shared_characters).drop_duplicates(subset=['shared_char', 'chinese']).reset_index(drop=True)
+    return compute_shared_character_df_with_keys(df)[0]
 
 
+@timed
 def compute_shared_character_options(df_shared_char):
-    df_by_char = df_shared_char.groupby('shared_char').agg({
-        'chinese': lambda x: ';'.join(x),
-        'english': lambda x: ';'.join(x),
-        'pinyin': lambda x: ';'.join(x)
-    }).reset_index()
-    df_by_char['n_words'] = df_by_char['chinese'].apply(lambda x: len(x.split(';')))
+    # Group rows by character (in sorted character order, like groupby) without a Python-level groupby
+    char_codes, chars = pd.factorize(df_shared_char['shared_char'], sort=True)
+    order = np.argsort(char_codes, kind='stable')
+    n_words = np.bincount(char_codes, minlength=len(chars))
+    group_ends = np.cumsum(n_words)
+    group_starts = group_ends - n_words
+
+    def join_by_char(col):
+        values = df_shared_char[col].array.take(order).tolist()
+        return [';'.join(values[start:end]) for start, end in zip(group_starts, group_ends)]
+
+    df_by_char = pd.DataFrame({
+        'shared_char': chars.to_numpy(dtype=object),
+        'chinese': join_by_char('chinese'),
+        'english': join_by_char('english'),
+        'pinyin': join_by_char('pinyin'),
+        'n_words': n_words,
+    })
     return df_by_char.sort_values('n_words', ascending=False)
 
 
-def load_google_sheet():
+@timed
+def load_google_sheet(sheet_url=vocab_sheet_url):
     cols_keep = [
         'id', 'chinese', 'pinyin', 'english', 'type', 'priority', 'quality', 
         'known', 'known_pinyin_prompt', 'known_english_prompt', 'phonetic', 'category1', 'category2',
         'word1', 'word1_english', 'word2', 'word2_english', 'word3', 'word3_english', 'word4', 'word4_english',
         'reverse chinese', 'date',
         ]
-    types_keep = [
-        'combo', 'no combo', 'two word', 'suffix', 'single char', 'abbreviation', 'prefix', 'phrase', 'phrase_save'
-    ]
-    sheet_url = 'https://docs.google.com/spreadsheets/d/1pw9EAIvtiWenPDBFBIf7pwTh0FvIbIR0c3mY5gJwlDk/edit#gid=0'
-    sheet_url = sheet_url.replace('/edit#gid=', '/export?format=csv&gid=')
     df = pd.read_csv(sheet_url)[cols_keep]
-    df = df[df['type'].isin(types_keep)].reset_index(drop=True)
+    df = df[df['type'].isin(vocab_types)].reset_index(drop=True)
     df = df.dropna(subset=['chinese', 'pinyin', 'english', 'id'])
     df['priority'] = df['priority'].fillna(6)
     df['known'] = df['known'].fillna(6)
     df['quality'] = df['quality'].fillna(6)
-    return df
+    return apply_vocab_schema(df)
 
 
-def filter_raw_data_vocab(df_raw):
-    df = df_raw[df_raw['priority'] <= st.session_state['max_priority_rating']].reset_index(drop=True)
-    df = df[df['known'] >= st.session_state['min_known_rating']].reset_index(drop=True)
-    if st.session_state['prompt_show_chinese_combo'] == 'Yes':
-        df = df[df['quality'] <= st.session_state['max_quality_rating']].reset_index(drop=True)
-    df = df[df['type'].isin(st.session_state['vocab_types_eligible'])].reset_index(drop=True)
-    df = df[df['category1'].isin(st.session_state['vocab_cat_eligible'])].reset_index(drop=True)
-    df = df.sort_values('id').sample(frac=1.0, random_state=st.session_state['random_state']).reset_index(drop=True)
-    df = df.loc[np.roll(df.index, -st.session_state['starting_index'])].reset_index(drop=True)
-    return df
+def add_answer_keys(df):
+    # Normalized answers, so grading a submit only has to normalize the guess
+    return df.assign(
+        english_key=df['english'].map(compile_english_answer_key),
+        chinese_key=df['chinese'].map(compile_chinese_answer_key),
+    )
+
+
+def _code_points(words):
+    # Code points of all characters of the words, concatenated, and each word's length
+    code_points = np.frombuffer(''.join(words.tolist()).encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+    return code_points, words.str.len().to_numpy(dtype=np.int64)
+
+
+@timed
+def add_component_shared_chars(df):
+    # wordN_shared_char: the character component word N shares with the combo word, found once at load time.
+    # That is the component's first character (in component order) that is also in the combo word, else its
+    # first character. All four columns are done at once on (row, code point) keys rather than per row.
+    n_rows = len(df)
+    components = pd.concat([df[f'word{i_word}'] for i_word in range(1, 5)], ignore_index=True).fillna('')
+    component_chars, component_lengths = _code_points(components)
+    combo_chars, combo_lengths = _code_points(df['chinese'].fillna(''))
+
+    # A component character is shared when its row's combo word has the same (row, code point) key
+    n_code_points = 0x110000
+    component_of_char = np.repeat(np.arange(len(components)), component_lengths)
+    component_keys = (component_of_char % max(n_rows, 1)) * n_code_points + component_chars
+    combo_keys = np.sort(np.repeat(np.arange(n_rows), combo_lengths) * n_code_points + combo_chars)
+    # Binary search in the sorted combo keys (np.isin() sorts both arrays together, which is slower here)
+    found_at = np.minimum(np.searchsorted(combo_keys, component_keys), max(len(combo_keys) - 1, 0))
+    shared_positions = np.flatnonzero(combo_keys[found_at] == component_keys) if len(combo_keys) else found_at[:0]
+    chosen_positions = np.cumsum(component_lengths) - component_lengths
+    # Shared positions are in order, so the first one of each component is its first shared character
+    sharing_components, first_shared = np.unique(component_of_char[shared_positions], return_index=True)
+    chosen_positions[sharing_components] = shared_positions[first_shared]
+
+    has_component = component_lengths > 0
+    shared_chars = np.full(len(components), np.nan, dtype=object)
+    shared_chars[has_component] = component_chars[chosen_positions[has_component]].astype(np.uint32).view('<U1')
+    return df.assign(**{
+        f'word{i_word}_shared_char': pd.array(shared_chars[(i_word - 1) * n_rows:i_word * n_rows], dtype=lean_string_dtype)
+        for i_word in range(1, 5)
+    })
+
+
+# Columns load_vocab_dataset() adds to the cleaned sheet
+derived_vocab_cols = ['english_key', 'chinese_key', 'word1_shared_char', 'word2_shared_char', 'word3_shared_char', 'word4_shared_char']
+
+
+# Columns WordGraph() reads
+word_graph_cols = ['chinese', 'word1', 'word2', 'word3', 'word4']
+
+
+def add_derived_vocab_cols(df):
+    return add_component_shared_chars(add_answer_keys(df))
+
+
+def compute_shared_char_counts(df_shared_char_options, shared_char_index):
+    # Per-character word counts (with and without phrases) and rank by count, 1 = most words
+    chars = df_shared_char_options['shared_char'].to_numpy()
+    return pd.DataFrame({
+        'n_words': df_shared_char_options['n_words'].to_numpy(),
+        'n_words_only': [len(shared_char_index.positions_words_only.get(char, ())) for char in chars],
+        'rank': np.arange(1, len(chars) + 1),
+    }, index=pd.Index(chars, name='shared_char'))
+
+
+def _vocab_dataset(version, fetched_at, df_raw, df_shared_char, df_shared_char_options, shared_char_index, search_index, word_graph, pinyin_answer_index, shared_char_keys, row_hashes):
+    df_shared_char_counts = compute_shared_char_counts(df_shared_char_options, shared_char_index)
+    return {
+        'version': version,
+        'fetched_at': fetched_at,
+        'df_raw': df_raw,
+        'records': RecordTable(df_raw),
+        'df_shared_char': df_shared_char,
+        'df_shared_char_options': df_shared_char_options,
+        'df_shared_char_counts': df_shared_char_counts,
+        # Characters offered in the review mode's list, most common first
+        'review_char_options': tuple(df_shared_char_counts.index[df_shared_char_counts['n_words'].to_numpy() >= review_min_words]),
+        'shared_char_index': shared_char_index,
+        'search_index': search_index,
+        'word_graph': word_graph,
+        'pinyin_answer_index': pinyin_answer_index,
+        # For refresh_vocab_dataset(); row_hashes are computed on the first refresh if not known yet
+        'shared_char_keys': shared_char_keys,
+        'row_hashes': row_hashes,
+    }
+
+
+def build_vocab_dataset(df_sheet, version, fetched_at, row_hashes=None):
+    df_raw = add_derived_vocab_cols(df_sheet)
+    df_shared_char, shared_char_keys = compute_shared_character_df_with_keys(df_raw)
+    shared_char_index = SharedCharIndex(df_shared_char)
+    return _vocab_dataset(
+        version, fetched_at, df_raw, df_shared_char, compute_shared_character_options(df_shared_char),
+        shared_char_index, WordSearchIndex(shared_char_index, df_raw), WordGraph(df_raw), PinyinAnswerIndex(df_raw),
+        shared_char_keys, row_hashes)
+
+
+def load_vocab_dataset(sheet_url=vocab_sheet_url, prefer_snapshot=False):
+    # Raw sheet and the tables derived from it, shared read-only by all sessions.
+    # With prefer_snapshot, the local snapshot is used instead of the network when it is recent enough.
+    if prefer_snapshot:
+        df_sheet, version, fetched_at = load_with_snapshot('vocab', load_google_sheet, sheet_url)
+        # Parquet gives strings back Python-backed
+        return build_vocab_dataset(apply_vocab_schema(df_sheet), version, fetched_at)
+    df_sheet, row_hashes, version, fetched_at = fetch_rows_with_snapshot('vocab', load_google_sheet, sheet_url)
+    return build_vocab_dataset(df_sheet, version, fetched_at, row_hashes)
 
 
-def load_data_english():
+@timed
+def refresh_vocab_dataset(dataset, sheet_url=vocab_sheet_url):
+    # Fetch the sheet again and bring the dataset up to date: as is when the content hash is unchanged,
+    # otherwise by editing the derived tables for just the rows that changed
+    df_sheet, row_hashes, version, fetched_at = fetch_rows_with_snapshot('vocab', load_google_sheet, sheet_url)
+    if version == dataset['version']:
+        return {**dataset, 'fetched_at': fetched_at}
+    return update_vocab_dataset(dataset, df_sheet, version, fetched_at, row_hashes)
+
+
+def _words_in_rows(df, rows):
+    # Every word (combo or component) in the given row positions
+    words = set()
+    for col_tuple in shared_character_cols:
+        words.update(word for word in df[col_tuple[0]].array[rows].tolist() if isinstance(word, str))
+    return words
+
+
+@timed
+def update_vocab_dataset(dataset, df_sheet, version, fetched_at, row_hashes=None):
+    # Apply the inserts, updates and deletes between dataset's sheet and df_sheet (matched by id, compared
+    # by row hash) to the derived columns, the shared-character tables and the index. The result is the
+    # same as build_vocab_dataset(df_sheet, ...), which is used instead when ids aren't unique, when rows
+    # were reordered, or when too many rows changed for the edit to be cheaper than a rebuild.
+    df_old = dataset['df_raw']
+    old_row_hashes = dataset['row_hashes']
+    if old_row_hashes is None:
+        old_row_hashes = compute_row_hashes(df_old.drop(columns=derived_vocab_cols))
+    new_row_hashes = compute_row_hashes(df_sheet) if row_hashes is None else row_hashes
+    old_ids = pd.Index(df_old['id'].to_numpy())
+    new_ids = pd.Index(df_sheet['id'].to_numpy())
+    if not (old_ids.is_unique and new_ids.is_unique):
+        return build_vocab_dataset(df_sheet, version, fetched_at, new_row_hashes)
+
+    # Sheet rows are unchanged when a row with the same id and the same hash was there before
+    position_in_old = old_ids.get_indexer(new_ids)
+    is_unchanged = position_in_old >= 0
+    is_unchanged[is_unchanged] = old_row_hashes[position_in_old[is_unchanged]] == new_row_hashes[is_unchanged]
+    old_position_to_new = np.full(len(df_old), -1)
+    old_position_to_new[position_in_old[is_unchanged]] = np.flatnonzero(is_unchanged)
+    changed_new_rows = np.flatnonzero(~is_unchanged)
+    changed_old_rows = np.flatnonzero(old_position_to_new < 0)
+    if len(changed_new_rows) + len(changed_old_rows) > incremental_refresh_max_changed_fraction * max(len(df_sheet), 1):
+        return build_vocab_dataset(df_sheet, version, fetched_at, new_row_hashes)
+    # Moved rows can change which occurrence of a word comes first, so a reorder is rebuilt too
+    if np.any(np.diff(position_in_old[is_unchanged]) <= 0):
+        return build_vocab_dataset(df_sheet, version, fetched_at, new_row_hashes)
+
+    # Derived columns: copied for unchanged rows, computed for the rest
+    df_changed = add_derived_vocab_cols(df_sheet.iloc[changed_new_rows])
+    derived = {}
+    for col in derived_vocab_cols:
+        values = np.empty(len(df_sheet), dtype=object)
+        values[is_unchanged] = df_old[col].to_numpy()[position_in_old[is_unchanged]]
+        values[changed_new_rows] = df_changed[col].to_numpy()
+        # The answer keys stay object (tuples, and the same dtype as a full build); the shared characters
+        # are Arrow strings. Taken from the schema, not from df_changed, which is empty when rows were only deleted.
+        derived[col] = pd.Series(values, index=df_sheet.index, dtype=lean_string_dtype if col.endswith('_shared_char') else object)
+    df_raw = df_sheet.assign(**derived)
+
+    # Shared-character table: words in a changed row (before or after the edit) are re-derived from their
+    # first occurrence in the new sheet; the rows of all other words are kept, with their keys moved to
+    # their row's new position
+    n_slots = len(shared_character_cols)
+    affected_words = _words_in_rows(df_old, changed_old_rows) | _words_in_rows(df_raw, changed_new_rows)
+    df_old_shared_char = dataset['df_shared_char']
+    is_kept = ~dataset['shared_char_index'].word_rows(affected_words)
+    kept_rows, kept_slots = np.divmod(dataset['shared_char_keys'][is_kept], n_slots)
+    kept_keys = old_position_to_new[kept_rows] * n_slots + kept_slots
+
+    occurrences, occurrence_keys = [], []
+    # Index.get_indexer() rather than isin(), which is slow on Arrow strings with many values to match
+    affected_word_index = pd.Index(list(affected_words), dtype=lean_string_dtype)
+    for slot, col_tuple in enumerate(shared_character_cols):
+        rows = np.flatnonzero(affected_word_index.get_indexer(df_raw[col_tuple[0]]) >= 0)
+        occurrences.append(_words_from_cols(df_raw.iloc[rows], col_tuple))
+        occurrence_keys.append(rows * n_slots + slot)
+    occurrence_keys = np.concatenate(occurrence_keys)
+    order = np.argsort(occurrence_keys, kind='stable')
+    df_affected_words = pd.concat(occurrences, ignore_index=True).take(order).reset_index(drop=True)
+    is_first = ~df_affected_words.duplicated(subset=['chinese']).to_numpy()
+    is_first &= df_affected_words.notna().all(axis=1).to_numpy()
+    df_new_shared_char, new_keys = _expand_shared_chars(
+        df_affected_words[is_first].reset_index(drop=True), occurrence_keys[order][is_first])
+
+    all_keys = np.concatenate([kept_keys, new_keys])
+    order = np.argsort(all_keys, kind='stable')
+    df_shared_char = pd.concat([df_old_shared_char[is_kept], df_new_shared_char], ignore_index=True).take(order).reset_index(drop=True)
+    concat_position_to_new = np.empty(len(order), dtype=np.int64)
+    concat_position_to_new[order] = np.arange(len(order))
+    old_to_new = np.full(len(df_old_shared_char), -1, dtype=np.int64)
+    n_kept = is_kept.sum()
+    old_to_new[is_kept] = concat_position_to_new[:n_kept]
+
+    # Indexes and per-character options: only the characters and search tokens of affected words are recomputed
+    affected_chars = set(''.join(affected_words))
+    shared_char_index = dataset['shared_char_index'].updated(df_shared_char, old_to_new, concat_position_to_new[n_kept:], affected_chars)
+    search_index = dataset['search_index'].updated(shared_char_index, df_raw, affected_words)
+    # The word graph only depends on each row's word and components, so edits that keep every row in place
+    # and those columns as they were (the usual English or pinyin fix) keep it
+    word_graph = dataset['word_graph']
+    keeps_rows = len(df_old) == len(df_raw) and np.array_equal(position_in_old, np.arange(len(df_raw)))
+    if not (keeps_rows and df_old[word_graph_cols].iloc[changed_old_rows].reset_index(drop=True).equals(
+            df_raw[word_graph_cols].iloc[changed_new_rows].reset_index(drop=True))):
+        word_graph = WordGraph(df_raw)
+    pinyin_answer_index = dataset['pinyin_answer_index'].updated(df_old, changed_old_rows, df_raw, changed_new_rows)
+    df_old_options = dataset['df_shared_char_options']
+    df_options = pd.concat([
+        df_old_options[~df_old_options['shared_char'].isin(affected_chars)],
+        compute_shared_character_options(df_shared_char.take(shared_char_index.char_rows(affected_chars))),
+    ])
+    # Same row order as compute_shared_character_options() on the whole table
+    df_options = df_options.sort_values('shared_char', kind='stable').reset_index(drop=True).sort_values('n_words', ascending=False)
+
+    return _vocab_dataset(
+        version, fetched_at, df_raw, df_shared_char, df_options, shared_char_index, search_index, word_graph, pinyin_answer_index,
+        all_keys[order], new_row_hashes)
+
+
+def build_english_dataset(df_sheet, version, fetched_at):
+    df_english_raw = add_answer_keys(df_sheet)
+    return {
+        'version': version,
+        'fetched_at': fetched_at,
+        'df_english_raw': df_english_raw,
+        'records': RecordTable(df_english_raw),
+    }
+
+
+@timed
+def load_english_dataset(sheet_url=english_sheet_url, prefer_snapshot=False):
+    load_sheet = load_with_snapshot if prefer_snapshot else fetch_with_snapshot
+    return build_english_dataset(*load_sheet('english', load_data_english, sheet_url))
+
+
+@timed
+def refresh_english_dataset(dataset, sheet_url=english_sheet_url):
+    # The English sheet is small, so a changed sheet is simply rebuilt
+    df_sheet, version, fetched_at = fetch_with_snapshot('english', load_data_english, sheet_url)
+    if version == dataset['version']:
+        return {**dataset, 'fetched_at': fetched_at}
+    return build_english_dataset(df_sheet, version, fetched_at)
+
+
+def vocab_deck_settings():
+    # Everything that determines the vocab deck, in the order compute_vocab_deck_positions() expects
+    return (
+        st.session_state['max_priority_rating'],
+        st.session_state['min_known_rating'],
+        st.session_state['max_quality_rating'] if st.session_state['prompt_show_chinese_combo'] == 'Yes' else None,
+        tuple(st.session_state['vocab_types_eligible']),
+        tuple(st.session_state['vocab_cat_eligible']),
+        int(st.session_state['random_state']),
+        int(st.session_state['starting_index']),
+    )
+
+
+def _shuffle_and_roll(positions, random_state, starting_index):
+    # Same order as df.sample(frac=1.0, random_state=random_state) followed by np.roll of the index
+    positions = positions[np.random.RandomState(random_state).permutation(len(positions))]
+    positions = np.roll(positions, -starting_index).astype(np.int32)
+    # Shared between sessions through the deck cache
+    positions.flags.writeable = False
+    return positions
+
+
+def compute_vocab_deck_positions(df_raw, settings):
+    # Row positions in df_raw of the deck for these settings, in play order.
+    # All filters are combined into one mask, so no intermediate frames are copied.
+    max_priority, min_known, max_quality, types, categories, random_state, starting_index = settings
+    mask = (df_raw['priority'].to_numpy() <= max_priority) & (df_raw['known'].to_numpy() >= min_known)
+    if max_quality is not None:
+        mask &= df_raw['quality'].to_numpy() <= max_quality
+    mask &= df_raw['type'].isin(types).to_numpy()
+    mask &= df_raw['category1'].isin(categories).to_numpy()
+    positions = np.flatnonzero(mask)
+    positions = positions[df_raw['id'].to_numpy()[positions].argsort(kind='quicksort')]
+    return _shuffle_and_roll(positions, random_state, starting_index)
+
+
+def get_deck_cache():
+    return _deck_cache
+
+
+def _get_deck_positions(deck_kind, compute_positions, df_raw, settings, version):
+    # Decks are memoized per dataset version and settings, so replaying with the same settings is instant
+    if version is None:
+        return compute_positions(df_raw, settings)
+    return _deck_cache.get_or_compute((deck_kind, version, settings), lambda: compute_positions(df_raw, settings))
+
+
+@timed
+def filter_raw_data_vocab(df_raw, version=None, settings=None):
+    # settings defaults to the current session's, see vocab_deck_settings()
+    settings = vocab_deck_settings() if settings is None else settings
+    positions = _get_deck_positions('vocab', compute_vocab_deck_positions, df_raw, settings, version)
+    return df_raw.take(positions).reset_index(drop=True)
+
+
+@timed
+def build_vocab_deck(dataset):
+    positions = _get_deck_positions('vocab', compute_vocab_deck_positions, dataset['df_raw'], vocab_deck_settings(), dataset['version'])
+    return Deck(dataset['records'], positions)
+
+
+@timed
+def load_data_english(sheet_url=english_sheet_url):
     cols_keep = [
         'english', 'IPA pronounce', 'pronounce help',
         '中文', '优先', '类型', '记忆', '难易', '例句', '定义'
        ]
-    sheet_url = 'https://docs.google.com/spreadsheets/d/1pw9EAIvtiWenPDBFBIf7pwTh0FvIbIR0c3mY5gJwlDk/edit#gid=47045332'
-    sheet_url = sheet_url.replace('/edit#gid=', '/export?format=csv&gid=')
     df = pd.read_csv(sheet_url)[cols_keep]
     df = df.dropna(subset=['中文', 'english'])
     df = df.rename(columns={'中文': 'chinese'})
@@ -99,9 +470,31 @@ def load_data_english():
     return df
 
 
-def filter_raw_data_english(df_raw):
-    df = df_raw[df_raw['优先'] <= st.session_state['max_priority_rating_english']].reset_index(drop=True)
-    df = df[df['记忆'] >= st.session_state['min_known_rating_english']].reset_index(drop=True)
-    df = df.sort_values('english').sample(frac=1.0, random_state=st.session_state['random_state']).reset_index(drop=True)
-    df = df.loc[np.roll(df.index, -st.session_state['starting_index'])].reset_index(drop=True)
-    return df
+def english_deck_settings():
+    return (
+        st.session_state['max_priority_rating_english'],
+        st.session_state['min_known_rating_english'],
+        int(st.session_state['random_state']),
+        int(st.session_state['starting_index']),
+    )
+
+
+def compute_english_deck_positions(df_raw, settings):
+    max_priority, min_known, random_state, starting_index = settings
+    mask = (df_raw['优先'].to_numpy() <= max_priority) & (df_raw['记忆'].to_numpy() >= min_known)
+    positions = np.flatnonzero(mask)
+    positions = positions[df_raw['english'].to_numpy()[positions].argsort(kind='quicksort')]
+    return _shuffle_and_roll(positions, random_state, starting_index)
+
+
+@timed
+def filter_raw_data_english(df_raw, version=None, settings=None):
+    settings = english_deck_settings() if settings is None else settings
+    positions = _get_deck_positions('english', compute_english_deck_positions, df_raw, settings, version)
+    return df_raw.take(positions).reset_index(drop=True)
+
+
+@timed
+def build_english_deck(dataset):
+    positions = _get_deck_positions('english', compute_english_deck_positions, dataset['df_english_raw'], english_deck_settings(), dataset['version'])
+    return Deck(dataset['records'], positions)
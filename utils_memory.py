@@ -0,0 +1,82 @@
+import sys
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+def deep_nbytes(obj, seen=None, exclude_ids=frozenset()):
+    # Approximate bytes held by obj and everything it references, counting each object once.
+    # Objects whose id is in exclude_ids (e.g. shared process-wide tables) are not counted.
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or id(obj) in exclude_ids:
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        # Column arrays handed out elsewhere (e.g. Arrow-backed strings in a RecordTable) are counted here, once
+        columns = [obj[col] for col in obj.columns] if isinstance(obj, pd.DataFrame) else [obj]
+        seen.update(id(column.array) for column in columns)
+        return int(obj.memory_usage(deep=True).sum()) if isinstance(obj, pd.DataFrame) else int(obj.memory_usage(deep=True))
+    if isinstance(obj, pd.api.extensions.ExtensionArray):
+        return int(obj.nbytes)
+    if isinstance(obj, np.ndarray):
+        if obj.base is not None:
+            # A view on memory counted with its owner, e.g. a DataFrame column behind a RecordTable
+            return 0
+        if obj.dtype == object:
+            return obj.nbytes + sum(deep_nbytes(item, seen, exclude_ids) for item in obj.ravel())
+        return obj.nbytes
+    n_bytes = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        n_bytes += sum(deep_nbytes(k, seen, exclude_ids) + deep_nbytes(v, seen, exclude_ids) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        n_bytes += sum(deep_nbytes(item, seen, exclude_ids) for item in obj)
+    elif hasattr(obj, '__dict__') and not isinstance(obj, type):
+        n_bytes += deep_nbytes(vars(obj), seen, exclude_ids)
+    return n_bytes
+
+
+def shared_object_ids(shared_objects):
+    # ids of the shared objects and of their direct members (tables in a dataset dict, arrays of a deck, ...)
+    ids = set()
+    for obj in shared_objects:
+        ids.add(id(obj))
+        members = obj.values() if isinstance(obj, dict) else vars(obj).values() if hasattr(obj, '__dict__') else ()
+        ids.update(id(member) for member in members)
+    return frozenset(ids)
+
+
+def session_memory_report(session_state, shared_objects):
+    # Bytes owned by one session, per session state key, not counting anything in shared_objects
+    exclude_ids = shared_object_ids(shared_objects)
+    seen = set()
+    by_key = {key: deep_nbytes(value, seen, exclude_ids) for key, value in session_state.items()}
+    return {
+        'session_bytes': sum(by_key.values()),
+        'session_bytes_by_key': dict(sorted(by_key.items(), key=lambda item: -item[1])),
+    }
+
+
+def process_memory_report(datasets, caches=()):
+    # Bytes held once per process by the shared datasets and caches, plus the process peak RSS
+    report = {}
+    for name, dataset in datasets.items():
+        if dataset is not None:
+            report[f'{name}_bytes'] = deep_nbytes(dataset)
+    for name, cache in caches:
+        report[f'{name}_bytes'] = deep_nbytes(cache)
+    report['peak_rss_bytes'] = peak_rss_bytes()
+    return report
+
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
@@ -0,0 +1,140 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils_cache import LRUCache
+from utils_compute import count_component_words
+from utils_config import panel_cache_size, panel_prefetch_words, panel_prefetch_workers
+from utils_timing import timed
+
+# Finished markdown for the feedback screen, keyed by (dataset version, word id, n_example_words_display)
+_panel_cache = LRUCache(panel_cache_size)
+# Panels of the words coming up in a session's deck, built while the prompt is on screen
+_panel_prefetch_executor = ThreadPoolExecutor(max_workers=max(1, panel_prefetch_workers), thread_name_prefix='panel-prefetch')
+_panel_prefetch_lock = threading.Lock()
+_panel_prefetch_pending = set()
+_panel_prefetch_counts = {'submitted': 0, 'built': 0, 'errors': 0}
+# Words listed as built from the current word
+n_used_in_display = 5
+
+
+def get_panel_cache():
+    return _panel_cache
+
+
+def _example_words_markdown(shared_char_index, shared_char, exclude, n_example_words_display):
+    other_words = shared_char_index.lookup(shared_char, require_pinyin=True, exclude=exclude)
+    example_words = other_words[:n_example_words_display]
+    lines = [f"{len(other_words)} other words with '{shared_char}':"]
+    lines += [
+        f"{chinese} ({pinyin}) - {english}"
+        for chinese, pinyin, english in zip(
+            shared_char_index.chinese[example_words], shared_char_index.pinyin[example_words], shared_char_index.english[example_words])
+    ]
+    return '\n\n'.join(lines)
+
+
+def build_full_vocab_panels(problem_row, shared_char_index, word_graph, n_example_words_display):
+    # Everything display_full_vocab() writes: the word itself and the words built from it, its component
+    # words (with their own components), and for each component (or each character, for words without
+    # components) other words sharing a character
+    chinese = problem_row['chinese']
+    used_in = [word for word in word_graph.used_in(chinese) if word != chinese]
+    panels = {
+        'header': f"[{chinese}](https://www.dong-chinese.com/dictionary/search/{chinese}) ({problem_row['pinyin']}) - {problem_row['english']}",
+        'used_in': f"Component of: {', '.join(used_in[:n_used_in_display])}{' ...' if len(used_in) > n_used_in_display else ''}" if used_in else '',
+        'components': [],
+        'examples': [],
+    }
+    n_component_words = count_component_words(problem_row)
+    panels['n_component_words'] = n_component_words
+    for i_word in range(1, n_component_words + 1):
+        component_word = problem_row[f'word{i_word}']
+        sub_components = word_graph.components(component_word) if component_word != chinese else []
+        sub_components_str = f" = {' + '.join(sub_components)}" if sub_components else ''
+        panels['components'].append(
+            f"Component word {i_word}: [{component_word}](https://www.dong-chinese.com/dictionary/search/{component_word}) ({problem_row[f'word{i_word}_english']}){sub_components_str}")
+
+    if n_example_words_display > 0:
+        if n_component_words > 0:
+            for i_word in range(1, n_component_words + 1):
+                shared_char = problem_row[f'word{i_word}_shared_char']
+                panels['examples'].append(_example_words_markdown(
+                    shared_char_index, shared_char, (shared_char, problem_row[f'word{i_word}'], chinese), n_example_words_display))
+        else:
+            for shared_char in chinese:
+                panels['examples'].append(_example_words_markdown(shared_char_index, shared_char, (), n_example_words_display))
+    return panels
+
+
+def _panels_key(dataset, problem_row, n_example_words_display):
+    return (dataset['version'], problem_row['id'], n_example_words_display)
+
+
+@timed
+def get_full_vocab_panels(dataset, problem_row, n_example_words_display):
+    return _panel_cache.get_or_compute(
+        _panels_key(dataset, problem_row, n_example_words_display),
+        lambda: build_full_vocab_panels(problem_row, dataset['shared_char_index'], dataset['word_graph'], n_example_words_display),
+    )
+
+
+def _prefetch_panels(key, dataset, problem_row, n_example_words_display):
+    try:
+        _panel_cache.get_or_compute(
+            key, lambda: build_full_vocab_panels(problem_row, dataset['shared_char_index'], dataset['word_graph'], n_example_words_display))
+        outcome = 'built'
+    except Exception:
+        # The click path builds the panels again and raises there
+        outcome = 'errors'
+    with _panel_prefetch_lock:
+        _panel_prefetch_pending.discard(key)
+        _panel_prefetch_counts[outcome] += 1
+
+
+def prefetch_full_vocab_panels(dataset, deck, n_example_words_display, n_words=panel_prefetch_words):
+    # Build the panels of the deck's current word and the next n_words in the background, so Submit and
+    # Next word find them in the cache. Words already cached or being built are skipped.
+    submitted = 0
+    if n_words <= 0:
+        return submitted
+    for problem_row in deck.upcoming(n_words + 1):
+        key = _panels_key(dataset, problem_row, n_example_words_display)
+        with _panel_prefetch_lock:
+            if key in _panel_prefetch_pending or key in _panel_cache:
+                continue
+            _panel_prefetch_pending.add(key)
+            _panel_prefetch_counts['submitted'] += 1
+        _panel_prefetch_executor.submit(_prefetch_panels, key, dataset, problem_row, n_example_words_display)
+        submitted += 1
+    return submitted
+
+
+def panel_prefetch_stats():
+    with _panel_prefetch_lock:
+        return {**_panel_prefetch_counts, 'pending': len(_panel_prefetch_pending)}
+
+
+def review_page(dataset, shared_char, words_only, page, page_size):
+    # One page of the shared-character review listing as table columns.
+    # Only the page's rows are touched, so the cost is the same for any character.
+    shared_char_index = dataset['shared_char_index']
+    positions = shared_char_index.lookup(shared_char, words_only=words_only)
+    page_positions = positions[(page - 1) * page_size:page * page_size]
+    return {
+        'Word': shared_char_index.chinese[page_positions].tolist(),
+        'Pinyin': shared_char_index.pinyin[page_positions].tolist(),
+        'English': shared_char_index.english[page_positions].tolist(),
+    }
+
+
+def review_search_page(dataset, query, words_only, page, page_size):
+    # One page of the ranked search results for a review query (characters, pinyin or English), and the
+    # number of matches. Only the words up to the end of the page are ranked.
+    search_index = dataset['search_index']
+    shared_char_index = dataset['shared_char_index']
+    positions, n_matches = search_index.search(query, words_only=words_only, limit=page * page_size)
+    page_positions = positions[(page - 1) * page_size:page * page_size]
+    return n_matches, {
+        'Word': shared_char_index.chinese[page_positions].tolist(),
+        'Pinyin': search_index.pinyin_of_rows(page_positions),
+        'English': shared_char_index.english[page_positions].tolist(),
+    }
@@ -0,0 +1,177 @@
+import heapq
+import os
+import sqlite3
+import threading
+import time
+from utils_config import data_dir, scheduler_new_word_spacing_seconds, scheduler_relearn_seconds
+
+# Spaced-repetition scheduling for the 'vocab' game: each learner's review history lives in a local
+# SQLite database, and a game plays the deck in order of due time from a heap
+
+_day_seconds = 24 * 3600
+_min_ease = 1.3
+_max_ease = 3.0
+
+
+class ReviewStore:
+    # One SQLite database per process, shared by every session (hence the lock)
+    def __init__(self, path=None):
+        self.path = path or os.path.join(data_dir, 'reviews.sqlite3')
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            # A submit's review commit is on the click path: in WAL mode, NORMAL only syncs at checkpoints
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS reviews ('
+                ' learner TEXT NOT NULL, word_id INTEGER NOT NULL,'
+                ' due_at REAL NOT NULL, interval_seconds REAL NOT NULL, ease REAL NOT NULL,'
+                ' n_reviews INTEGER NOT NULL, n_lapses INTEGER NOT NULL, last_reviewed_at REAL NOT NULL,'
+                ' PRIMARY KEY (learner, word_id))'
+            )
+
+    def load_reviews(self, learner):
+        # {word_id: review state} for every word the learner has reviewed
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT word_id, due_at, interval_seconds, ease, n_reviews, n_lapses, last_reviewed_at'
+                ' FROM reviews WHERE learner = ?', (learner,)).fetchall()
+        return {
+            row[0]: {
+                'due_at': row[1], 'interval_seconds': row[2], 'ease': row[3],
+                'n_reviews': row[4], 'n_lapses': row[5], 'last_reviewed_at': row[6],
+            }
+            for row in rows
+        }
+
+    def save_review(self, learner, word_id, review):
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO reviews'
+                ' (learner, word_id, due_at, interval_seconds, ease, n_reviews, n_lapses, last_reviewed_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (learner, word_id, review['due_at'], review['interval_seconds'], review['ease'],
+                 review['n_reviews'], review['n_lapses'], review['last_reviewed_at']),
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def next_review(review, correct, now):
+    # SM-2 style update: a right answer multiplies the interval by the ease (first one: 1 day),
+    # a wrong one resets it and makes the word due again after the relearn delay
+    if review is None:
+        review = {'due_at': now, 'interval_seconds': 0.0, 'ease': 2.5, 'n_reviews': 0, 'n_lapses': 0, 'last_reviewed_at': now}
+    if correct:
+        interval_seconds = max(_day_seconds, review['interval_seconds'] * review['ease'])
+        ease = min(_max_ease, review['ease'] + 0.1)
+        n_lapses = review['n_lapses']
+    else:
+        interval_seconds = scheduler_relearn_seconds
+        ease = max(_min_ease, review['ease'] - 0.2)
+        n_lapses = review['n_lapses'] + 1
+    return {
+        'due_at': now + interval_seconds,
+        'interval_seconds': interval_seconds,
+        'ease': ease,
+        'n_reviews': review['n_reviews'] + 1,
+        'n_lapses': n_lapses,
+        'last_reviewed_at': now,
+    }
+
+
+class ScheduledDeck:
+    # Drop-in replacement for Deck that plays words in order of due time instead of a fixed order.
+    # Words never reviewed are due from the start of the game, spaced out in the deck's shuffled order;
+    # previously reviewed words keep their stored due time. Words learned earlier and not yet due again
+    # are left out of the game. Choosing the next word is a heap pop, O(log n).
+    def __init__(self, deck, store, learner, now=None):
+        self.table = deck.table
+        self.store = store
+        self.learner = learner
+        self.position = 0
+        self.reviews = store.load_reviews(learner)
+        now = time.time() if now is None else now
+        word_ids = self.table.arrays[self.table.columns.index('id')]
+        self._heap = []
+        for order, row_position in enumerate(deck.positions[deck.position:]):
+            review = self.reviews.get(int(word_ids[row_position]))
+            if review is None:
+                due_at = now + order * scheduler_new_word_spacing_seconds
+            elif review['due_at'] <= now or review['interval_seconds'] < _day_seconds:
+                # Due, or still being relearned after a wrong answer (comes back within the game)
+                due_at = review['due_at']
+            else:
+                continue
+            self._heap.append((due_at, order, int(row_position)))
+        heapq.heapify(self._heap)
+        self.n_words = len(self._heap)
+        self._next_order = len(deck.positions)
+        # Review of the current word, before and after this game's answer (None until answered)
+        self._review_before = None
+        self._review_after = None
+
+    def __len__(self):
+        return self.n_words
+
+    def is_finished(self):
+        return not self._heap
+
+    def current(self):
+        return self.table.record(self._heap[0][2])
+
+    def upcoming(self, n_words):
+        # Records of the words due soonest, current word first. A wrong answer can put the current word
+        # back in between, so this is the likely order rather than a promise.
+        return [self.table.record(row_position) for _, _, row_position in heapq.nsmallest(n_words, self._heap)]
+
+    def _current_word_id(self):
+        return int(self.current()['id'])
+
+    def record_outcome(self, correct, now=None):
+        # Save the answer to the current word; calling it again (e.g. after "wrongly marked as incorrect")
+        # replaces the earlier outcome instead of counting a second review
+        now = time.time() if now is None else now
+        word_id = self._current_word_id()
+        if self._review_after is None:
+            self._review_before = self.reviews.get(word_id)
+        self._review_after = next_review(self._review_before, correct, now)
+        self.reviews[word_id] = self._review_after
+        self.store.save_review(self.learner, word_id, self._review_after)
+
+    def advance(self, n_words=1):
+        for _ in range(n_words):
+            if not self._heap:
+                break
+            _, _, row_position = heapq.heappop(self._heap)
+            # Words answered wrongly come back later in this game; right answers wait for a later game
+            if self._review_after is not None and self._review_after['interval_seconds'] < _day_seconds:
+                heapq.heappush(self._heap, (self._review_after['due_at'], self._next_order, row_position))
+                self._next_order += 1
+            self._review_before = None
+            self._review_after = None
+            self.position += 1
+
+    def jump(self, deck_index):
+        # Only forward jumps are possible in a scheduled deck
+        self.advance(max(0, deck_index - self.position))
+
+    def resume(self, position, game_started_at):
+        # Pick up a game started earlier, possibly in another server process: words answered right since
+        # the game started have already left it, the rest keep the due order of their stored reviews
+        word_ids = self.table.arrays[self.table.columns.index('id')]
+        self._heap = [
+            entry for entry in self._heap
+            if not _answered_right_since(self.reviews.get(int(word_ids[entry[2]])), game_started_at)
+        ]
+        heapq.heapify(self._heap)
+        self.position = position
+
+
+def _answered_right_since(review, started_at):
+    return review is not None and review['last_reviewed_at'] >= started_at and review['interval_seconds'] >= _day_seconds
@@ -0,0 +1,150 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from utils_config import data_dir, session_ttl_seconds
+
+# Compact game state of each browser session, kept outside the server process so a reload, a restarted
+# server or another worker behind the load balancer can resume the game. Only settings, the deck position
+# and the score are stored; decks are rebuilt from them and the process-wide dataset cache.
+
+# Session state keys that are saved. The deck settings are enough to rebuild the same deck.
+persisted_keys = (
+    'gameplay_option', 'vocab_order', 'learner',
+    'max_priority_rating', 'max_quality_rating', 'min_known_rating', 'vocab_types_eligible', 'vocab_cat_eligible',
+    'prompt_show_chinese', 'prompt_show_pinyin', 'prompt_show_chinese_combo', 'prompt_show_english_combo',
+    'n_example_words_display', 'random_state', 'starting_index',
+    'max_priority_rating_english', 'min_known_rating_english', 'prompt_type_english',
+    'game_started', 'game_started_at', 'current_index', 'n_guess', 'n_correct', 'n_streak', 'n_streak_previous', 'percent_correct',
+    'submitted_guess', 'guess_result', 'page_icon',
+)
+
+# Session ids come from the URL, so only this shape is accepted (it also keeps them safe as file names)
+_session_id_pattern = re.compile(r'[0-9a-f]{32}')
+
+
+def is_valid_session_id(session_id):
+    return isinstance(session_id, str) and _session_id_pattern.fullmatch(session_id) is not None
+
+
+def compact_session_state(session_state):
+    return {key: session_state[key] for key in persisted_keys if key in session_state}
+
+
+def dump_session_state(state):
+    # numpy scalars (e.g. from a deck record) are stored as plain numbers
+    return json.dumps(state, sort_keys=True, default=lambda value: value.item())
+
+
+class SQLiteSessionStore:
+    # One WAL-mode database shared by every process on the host; one row per session
+    def __init__(self, path=None, ttl_seconds=session_ttl_seconds):
+        self.path = path or os.path.join(data_dir, 'sessions.sqlite3')
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self.n_loads = 0
+        self.n_saves = 0
+        self._connection = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        with self._lock, self._connection:
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS sessions ('
+                ' session_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)'
+            )
+            # Sessions nobody came back to are dropped when a process starts
+            self._connection.execute('DELETE FROM sessions WHERE updated_at < ?', (time.time() - ttl_seconds,))
+
+    def load(self, session_id):
+        # The saved state, or None for a new session
+        with self._lock:
+            self.n_loads += 1
+            row = self._connection.execute('SELECT state FROM sessions WHERE session_id = ?', (session_id,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def save(self, session_id, state_json):
+        with self._lock, self._connection:
+            self.n_saves += 1
+            self._connection.execute(
+                'INSERT OR REPLACE INTO sessions (session_id, state, updated_at) VALUES (?, ?, ?)',
+                (session_id, state_json, time.time()))
+
+    def delete(self, session_id):
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+
+    def stats(self):
+        with self._lock:
+            n_sessions = self._connection.execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+            return {'backend': 'sqlite', 'loads': self.n_loads, 'saves': self.n_saves, 'sessions': n_sessions}
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class FileSessionStore:
+    # One JSON file per session, for a directory shared by the worker processes (e.g. a mounted volume)
+    def __init__(self, directory=None, ttl_seconds=session_ttl_seconds):
+        self.directory = directory or os.path.join(data_dir, 'sessions')
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.n_loads = 0
+        self.n_saves = 0
+        expires_before = time.time() - ttl_seconds
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.name.endswith('.json') and entry.stat().st_mtime < expires_before:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _path(self, session_id):
+        return os.path.join(self.directory, f'{session_id}.json')
+
+    def load(self, session_id):
+        with self._lock:
+            self.n_loads += 1
+        try:
+            with open(self._path(session_id), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, session_id, state_json):
+        # Written to a temporary file first, so a reader in another process never sees half a file
+        path = self._path(session_id)
+        path_tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(path_tmp, 'w', encoding='utf-8') as f:
+            f.write(state_json)
+        os.replace(path_tmp, path)
+        with self._lock:
+            self.n_saves += 1
+
+    def delete(self, session_id):
+        try:
+            os.remove(self._path(session_id))
+        except OSError:
+            pass
+
+    def stats(self):
+        with self._lock:
+            return {'backend': 'file', 'loads': self.n_loads, 'saves': self.n_saves}
+
+    def close(self):
+        pass
+
+
+session_store_backends = {'sqlite': SQLiteSessionStore, 'file': FileSessionStore}
+
+
+def make_session_store(kind):
+    # None when session state is only kept in the server process ('off')
+    if kind == 'off':
+        return None
+    if kind not in session_store_backends:
+        raise ValueError(f"Unknown session store '{kind}', expected one of {', '.join(session_store_backends)} or 'off'")
+    return session_store_backends[kind]()
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import numpy as np
+import pandas as pd
+from utils_config import data_dir, snapshot_max_age_seconds
+
+# Bump whenever the cleaning in the sheet loaders changes, so old snapshots are ignored
+snapshot_schema_version = 4
+
+# Data files replaced by a newer snapshot are deleted once they are this old, so a process that has just
+# read the metadata pointing to one can still open it
+_stale_data_file_seconds = 60
+
+
+def _meta_path(name):
+    return os.path.join(data_dir, f'{name}.json')
+
+
+def _data_file_name(name, content_hash):
+    # Named by content, so the metadata (replaced atomically) always points to the data it describes,
+    # even when several processes write the same snapshot at once
+    return f'{name}.{content_hash[:16]}.parquet'
+
+
+def _tmp_path(path):
+    # One temporary file per writer (process and thread)
+    return f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+
+def _remove_stale_data_files(name, keep_file_name):
+    expires_before = time.time() - _stale_data_file_seconds
+    for entry in os.scandir(data_dir):
+        try:
+            if (entry.name.startswith(f'{name}.') and entry.name.endswith('.parquet') and entry.name != keep_file_name
+                    and entry.stat().st_mtime < expires_before):
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def compute_row_hashes(df):
+    # One uint64 per row of the cell values (the index is ignored), for diffing two versions of a sheet
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def compute_content_hash(df, row_hashes=None):
+    hasher = hashlib.sha256()
+    hasher.update(json.dumps([str(c) for c in df.columns]).encode('utf-8'))
+    hasher.update((compute_row_hashes(df) if row_hashes is None else row_hashes).tobytes())
+    return hasher.hexdigest()
+
+
+def read_snapshot(name):
+    # Returns (df, metadata), or None if there is no usable snapshot
+    try:
+        with open(_meta_path(name), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('schema_version') != snapshot_schema_version:
+            return None
+        df = pd.read_parquet(os.path.join(data_dir, meta['data_file']))
+    except (OSError, ValueError, KeyError):
+        return None
+
+    # Parquet gives back None for missing strings, the loaders produce NaN
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].where(df[col].notna(), np.nan)
+    return df, meta
+
+
+def write_snapshot(name, df, source, content_hash):
+    os.makedirs(data_dir, exist_ok=True)
+    data_file_name = _data_file_name(name, content_hash)
+    meta = {
+        'schema_version': snapshot_schema_version,
+        'data_file': data_file_name,
+        'content_hash': content_hash,
+        'source': source,
+        'saved_at': time.time(),
+        'n_rows': len(df),
+    }
+    # Write to temporary files first so a concurrent reader never sees a half-written snapshot, and the
+    # data before the metadata that points to it
+    path_data = os.path.join(data_dir, data_file_name)
+    path_data_tmp = _tmp_path(path_data)
+    df.to_parquet(path_data_tmp)
+    os.replace(path_data_tmp, path_data)
+    path_meta = _meta_path(name)
+    path_meta_tmp = _tmp_path(path_meta)
+    with open(path_meta_tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(path_meta_tmp, path_meta)
+    _remove_stale_data_files(name, data_file_name)
+
+
+def fetch_rows_with_snapshot(name, fetch, source):
+    # Load a cleaned sheet with fetch(source) and save it as the new snapshot.
+    # Returns (df, row_hashes, content_hash, fetched_at)
+    df = fetch(source)
+    row_hashes = compute_row_hashes(df)
+    content_hash = compute_content_hash(df, row_hashes)
+    try:
+        write_snapshot(name, df, source, content_hash)
+    except OSError:
+        # A read-only filesystem only costs us the next cold start
+        pass
+    return df, row_hashes, content_hash, time.time()
+
+
+def fetch_with_snapshot(name, fetch, source):
+    # Returns (df, content_hash, fetched_at)
+    df, _, content_hash, fetched_at = fetch_rows_with_snapshot(name, fetch, source)
+    return df, content_hash, fetched_at
+
+
+def load_with_snapshot(name, fetch, source, max_age_seconds=snapshot_max_age_seconds):
+    # Load a cleaned sheet from its local snapshot, only calling fetch(source) when the snapshot is
+    # missing or out of date. If fetching fails, an out-of-date snapshot is still better than no data.
+    # Returns (df, content_hash, fetched_at)
+    snapshot = read_snapshot(name)
+    if snapshot is not None and snapshot[1].get('source') != source:
+        snapshot = None
+    if snapshot is not None:
+        df_snapshot, meta = snapshot
+        if time.time() - meta.get('saved_at', 0) <= max_age_seconds:
+            return df_snapshot, meta['content_hash'], meta['saved_at']
+
+    try:
+        return fetch_with_snapshot(name, fetch, source)
+    except Exception:
+        if snapshot is None:
+            raise
+        return df_snapshot, meta['content_hash'], meta['saved_at']
@@ -0,0 +1,64 @@
+import os
+import subprocess
+import sys
+import time
+from utils_timing import record_timing, timing_enabled
+
+# Cold-start measurements: how long the first home screen took, and which modules the imports spend it on.
+# Only standard-library imports here, since app.py imports this before first paint.
+
+heavy_modules = ('pandas', 'numpy', 'pyarrow')
+
+_first_paint = {}
+
+
+def process_started_at():
+    # Wall-clock start of this process, from /proc on Linux (None elsewhere)
+    try:
+        with open('/proc/self/stat', encoding='ascii') as f:
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime', encoding='ascii') as f:
+            uptime_seconds = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return time.time() - uptime_seconds + start_ticks / os.sysconf('SC_CLK_TCK')
+
+
+def record_home_screen_paint(rerun_start):
+    # Called once display_not_in_game() has rendered; the first call in a process is the cold start
+    paint_seconds = time.perf_counter() - rerun_start
+    if timing_enabled:
+        record_timing('home_screen_paint', paint_seconds)
+    if not _first_paint:
+        started_at = process_started_at()
+        _first_paint.update({
+            'first_rerun_to_paint_seconds': paint_seconds,
+            'process_start_to_first_paint_seconds': None if started_at is None else time.time() - started_at,
+            'heavy_modules_loaded_at_first_paint': [name for name in heavy_modules if name in sys.modules],
+        })
+
+
+def startup_report():
+    return dict(_first_paint)
+
+
+def import_time_breakdown(modules, n_top=15, python=sys.executable, cwd=None):
+    # Import the modules in a fresh interpreter with -X importtime. Returns the cumulative seconds of each
+    # requested module (in import order, so shared dependencies count for the first module that needs them)
+    # and the n_top modules with the highest self time.
+    code = ''.join(f'import {module}\n' for module in modules)
+    result = subprocess.run([python, '-X', 'importtime', '-c', code], capture_output=True, text=True, cwd=cwd, check=True)
+    cumulative_seconds = {}
+    self_seconds = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        self_seconds[name.strip()] = int(self_us) / 1e6
+        if not name.startswith('  '):
+            # Top-level entries (no indentation) are what the -c code imported directly
+            cumulative_seconds[name.strip()] = int(cumulative_us) / 1e6
+    return {
+        'modules': {module: cumulative_seconds.get(module, 0.0) for module in modules},
+        'top_self_seconds': dict(sorted(self_seconds.items(), key=lambda item: -item[1])[:n_top]),
+    }
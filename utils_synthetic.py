@@ -0,0 +1,144 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Synthetic vocab and English sheets with the same columns as the Google Sheets exports,
+# for benchmarks and load tests that must run offline
+
+_n_common_chars = 3500
+_pinyin_syllables = [
+    'ba', 'bai', 'ban', 'bang', 'bao', 'bei', 'ben', 'bi', 'bian', 'bing', 'bu', 'cai', 'chang', 'chen', 'chi',
+    'chu', 'da', 'dai', 'dan', 'dao', 'de', 'di', 'dian', 'dong', 'dou', 'fa', 'fang', 'fei', 'fen', 'feng',
+    'gan', 'gao', 'ge', 'gong', 'guo', 'hai', 'hao', 'he', 'hong', 'hua', 'huan', 'hui', 'ji', 'jia', 'jian',
+    'jiao', 'jin', 'jing', 'kai', 'kan', 'ke', 'kou', 'lai', 'lao', 'li', 'lian', 'liang', 'lu', 'ma', 'mai',
+    'men', 'mian', 'ming', 'na', 'nan', 'nian', 'nü', 'pao', 'pin', 'qi', 'qian', 'qing', 'qu', 'ren', 'ri',
+    'shan', 'shang', 'shao', 'shen', 'sheng', 'shi', 'shou', 'shu', 'shui', 'si', 'ta', 'tian', 'tong', 'wai',
+    'wan', 'wei', 'wen', 'wo', 'xi', 'xia', 'xian', 'xiang', 'xiao', 'xin', 'xing', 'xue', 'yang', 'yao', 'ye',
+    'yi', 'yin', 'you', 'yu', 'yuan', 'yue', 'zai', 'zhang', 'zhe', 'zhi', 'zhong', 'zhu', 'zi', 'zou', 'zuo',
+]
+_tone_marks = {
+    'a': 'āáǎà', 'e': 'ēéěè', 'i': 'īíǐì', 'o': 'ōóǒò', 'u': 'ūúǔù', 'ü': 'ǖǘǚǜ',
+}
+_english_words = [
+    'house', 'water', 'fire', 'mountain', 'river', 'person', 'big', 'small', 'eat', 'drink', 'walk', 'car',
+    'money', 'work', 'study', 'book', 'door', 'heart', 'hand', 'eye', 'mouth', 'light', 'dark', 'new', 'old',
+    'good', 'bad', 'long', 'short', 'high', 'low', 'cold', 'hot', 'country', 'city', 'market', 'insurance',
+    'protect', 'danger', 'butter', 'yellow', 'oil', 'half', 'island', 'loan', 'bank', 'electric', 'machine',
+    'language', 'time', 'day', 'year', 'friend', 'family', 'animal', 'clothes', 'road', 'sky', 'sea', 'tree',
+]
+_vocab_types = ['combo', 'no combo', 'two word', 'suffix', 'prefix', 'abbreviation', 'single char', 'phrase', 'phrase_save', 'sentence']
+_vocab_type_weights = [0.45, 0.15, 0.08, 0.04, 0.04, 0.02, 0.08, 0.08, 0.02, 0.04]
+_vocab_categories = [
+    '', 'food', 'general', 'career', 'characteristic', 'society', 'health', 'people', 'life', 'electronics',
+    'feeling', 'travel', 'outdoor', 'language', 'amount', 'time', 'verb', 'hobbies', 'china', 'shopping',
+]
+
+
+def _add_tone(syllable, tone):
+    # Tone mark on a, e or the o of 'ou', otherwise on the last vowel; tone 4 is neutral
+    if tone == 4:
+        return syllable
+    for vowel in ('a', 'e', 'ou'):
+        if vowel in syllable:
+            i_vowel = syllable.index(vowel)
+            break
+    else:
+        i_vowel = max(syllable.rfind(vowel) for vowel in _tone_marks)
+    return syllable[:i_vowel] + _tone_marks[syllable[i_vowel]][tone] + syllable[i_vowel + 1:]
+
+
+def _char_pinyin():
+    # Fixed reading for each common character, so a character always has the same pinyin
+    rng = np.random.default_rng(12345)
+    syllables = rng.choice(_pinyin_syllables, size=_n_common_chars)
+    tones = rng.integers(0, 5, size=_n_common_chars)
+    return [_add_tone(str(syllable), int(tone)) for syllable, tone in zip(syllables, tones)]
+
+
+def _make_english(rng, n_rows):
+    n_options = rng.choice([1, 2, 3], p=[0.6, 0.3, 0.1], size=n_rows)
+    words = rng.choice(_english_words, size=(n_rows, 3, 2))
+    n_words = rng.choice([1, 2], p=[0.7, 0.3], size=(n_rows, 3))
+    has_note = rng.random(n_rows) < 0.1
+    english = []
+    for i_row in range(n_rows):
+        options = [' '.join(words[i_row, i_option, :n_words[i_row, i_option]]) for i_option in range(n_options[i_row])]
+        if has_note[i_row]:
+            options[0] += f' ({words[i_row, 0, -1]})'
+        english.append('; '.join(options))
+    return english
+
+
+def make_vocab_sheet(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    char_pinyin = _char_pinyin()
+
+    # Zipf-like character frequencies, so common characters are shared by many words like in real vocab
+    char_weights = 1 / np.arange(1, _n_common_chars + 1)
+    char_codes = rng.choice(_n_common_chars, size=(n_rows, 4), p=char_weights / char_weights.sum())
+    word_lengths = rng.choice([1, 2, 3, 4], p=[0.1, 0.65, 0.15, 0.1], size=n_rows)
+    chinese = [''.join(chr(0x4E00 + code) for code in codes[:length]) for codes, length in zip(char_codes, word_lengths)]
+    pinyin = [' '.join(char_pinyin[code] for code in codes[:length]) for codes, length in zip(char_codes, word_lengths)]
+    types = rng.choice(_vocab_types, p=_vocab_type_weights, size=n_rows)
+
+    df = pd.DataFrame({
+        'id': np.arange(1, n_rows + 1),
+        'chinese': chinese,
+        'pinyin': pinyin,
+        'english': _make_english(rng, n_rows),
+        'type': types,
+        'priority': rng.choice([1, 2, 3, 4, 5, np.nan], size=n_rows),
+        'quality': rng.choice([1, 2, 3, 4, 5, np.nan], size=n_rows),
+        'known': rng.choice([1, 2, 3, 4, 5, np.nan], size=n_rows),
+        'known_pinyin_prompt': rng.choice([1, 2, 3, np.nan], size=n_rows),
+        'known_english_prompt': rng.choice([1, 2, 3, np.nan], size=n_rows),
+        'phonetic': '',
+        'category1': rng.choice(_vocab_categories, size=n_rows),
+        'category2': rng.choice(_vocab_categories, size=n_rows),
+        'notes': '',
+    })
+
+    # Combo words are built from 2-4 component words, each sharing one character with the combo word
+    n_components = np.where(types == 'combo', rng.choice([2, 3, 4], p=[0.8, 0.15, 0.05], size=n_rows), 0)
+    component_chars = rng.choice(_n_common_chars, size=(n_rows, 4), p=char_weights / char_weights.sum())
+    component_english = rng.choice(_english_words, size=(n_rows, 4))
+    for i_component in range(4):
+        has_component = n_components > i_component
+        df[f'word{i_component + 1}'] = [
+            word[i_component % len(word)] + chr(0x4E00 + code) if has else np.nan
+            for word, code, has in zip(chinese, component_chars[:, i_component], has_component)
+        ]
+        df[f'word{i_component + 1}_english'] = pd.Series(component_english[:, i_component], dtype=object).where(has_component)
+
+    df['reverse chinese'] = [word[::-1] for word in chinese]
+    df['date'] = pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 800, size=n_rows), unit='D')
+    df['date'] = df['date'].dt.strftime('%Y-%m-%d')
+    return df
+
+
+def make_english_sheet(n_rows, seed=0):
+    rng = np.random.default_rng(seed + 1)
+    english = rng.choice(_english_words, size=n_rows)
+    char_codes = rng.choice(_n_common_chars, size=(n_rows, 2))
+    return pd.DataFrame({
+        'english': [f'{word} {i_row}' if i_row >= len(_english_words) else word for i_row, word in enumerate(english)],
+        'IPA pronounce': '/ˈsɪn.θə.tɪk/',
+        'pronounce help': '',
+        '中文': [''.join(chr(0x4E00 + code) for code in codes) for codes in char_codes],
+        '优先': rng.choice([1, 2, 3, np.nan], size=n_rows),
+        '类型': 'noun',
+        '记忆': rng.choice([1, 2, 3, np.nan], size=n_rows),
+        '难易': rng.choice([1, 2, 3], size=n_rows),
+        '例句': pd.Series('An example sentence.', index=range(n_rows), dtype=object).where(rng.random(n_rows) < 0.5),
+        '定义': '',
+    })
+
+
+def write_fixture_sheets(directory, n_rows, seed=0):
+    # Write both sheets as CSV files; returns (vocab_path, english_path)
+    os.makedirs(directory, exist_ok=True)
+    vocab_path = os.path.join(directory, f'vocab_{n_rows}.csv')
+    english_path = os.path.join(directory, f'english_{n_rows}.csv')
+    make_vocab_sheet(n_rows, seed).to_csv(vocab_path, index=False)
+    make_english_sheet(max(n_rows // 10, 100), seed).to_csv(english_path, index=False)
+    return vocab_path, english_path
@@ -0,0 +1,108 @@
+import atexit
+import functools
+import json
+import threading
+import time
+from utils_config import timing_enabled, timing_report_path
+
+# Per-process timing histograms of the app's hot paths.
+# With COMBO_GAME_TIMING unset, timed() returns functions unchanged, so there is no overhead at all.
+
+bucket_bounds_seconds = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+_histograms = {}
+_lock = threading.Lock()
+
+
+class TimingHistogram:
+    def __init__(self):
+        self.bucket_counts = [0] * len(bucket_bounds_seconds)
+        self.count = 0
+        self.sum_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def add(self, seconds):
+        for i_bucket, bound in enumerate(bucket_bounds_seconds):
+            if seconds <= bound:
+                self.bucket_counts[i_bucket] += 1
+                break
+        self.count += 1
+        self.sum_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th quantile
+        target = q * self.count
+        n_seen = 0
+        for bound, n_bucket in zip(bucket_bounds_seconds, self.bucket_counts):
+            n_seen += n_bucket
+            if n_seen >= target and n_bucket > 0:
+                return min(bound, self.max_seconds)
+        return self.max_seconds
+
+
+def record_timing(name, seconds):
+    with _lock:
+        if name not in _histograms:
+            _histograms[name] = TimingHistogram()
+        _histograms[name].add(seconds)
+
+
+def timed(fn):
+    if not timing_enabled:
+        return fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            record_timing(fn.__name__, time.perf_counter() - start)
+    return wrapper
+
+
+def timing_report():
+    with _lock:
+        return {
+            name: {
+                'count': histogram.count,
+                'sum_seconds': histogram.sum_seconds,
+                'mean_seconds': histogram.sum_seconds / histogram.count,
+                'p50_seconds': histogram.quantile(0.5),
+                'p99_seconds': histogram.quantile(0.99),
+                'max_seconds': histogram.max_seconds,
+            }
+            for name, histogram in sorted(_histograms.items())
+        }
+
+
+def render_prometheus():
+    # Prometheus text exposition format, one histogram per timed function
+    lines = [
+        '# HELP combo_game_function_seconds Time spent in app functions and data helpers',
+        '# TYPE combo_game_function_seconds histogram',
+    ]
+    with _lock:
+        for name, histogram in sorted(_histograms.items()):
+            n_cumulative = 0
+            for bound, n_bucket in zip(bucket_bounds_seconds, histogram.bucket_counts):
+                n_cumulative += n_bucket
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'combo_game_function_seconds_bucket{{function="{name}",le="{le}"}} {n_cumulative}')
+            lines.append(f'combo_game_function_seconds_sum{{function="{name}"}} {histogram.sum_seconds}')
+            lines.append(f'combo_game_function_seconds_count{{function="{name}"}} {histogram.count}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_timing_report(path):
+    # .prom files get the Prometheus text format, anything else JSON
+    with open(path, 'w', encoding='utf-8') as f:
+        if path.endswith('.prom'):
+            f.write(render_prometheus())
+        else:
+            json.dump(timing_report(), f, indent=2)
+
+
+if timing_enabled and timing_report_path:
+    atexit.register(write_timing_report, timing_report_path)